@@ -0,0 +1,218 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import chess
+import chess.engine
+from transposition import cle_zobrist
+from ressources import registre, RessourceIndisponible, ENGINE_POOL_SIZE, ANALYSES_DB, a_la_sortie
+from instrumentation import mesures
+
+
+# Nombre de positions dont on garde l'analyse en mémoire
+TAILLE_CACHE_ANALYSES = 100000
+# Analyse demandée pour chaque position où MCTS attend le coup de l'adversaire
+LIMITE_ANALYSE = chess.engine.Limit(time=0.1, depth=18)
+# Nombre de lignes demandées au moteur (plus de lignes = moins de profondeur dans le même temps)
+MULTIPV_ANALYSE = 1
+
+
+def format_info(info):
+    score = info["score"].white()
+    mate_score = score.mate()
+    centipawn_score = score.score()
+    return {
+        "mate_score": mate_score,
+        "centipawn_score": centipawn_score,
+        "pv": format_moves(info.get("pv", [])),
+    }
+
+def format_moves(pv):
+    return [move.uci() for move in pv]
+
+
+def cle_limite(limite):
+    """Texte de la limite d'une analyse (temps, profondeur, noeuds, mat), pour les clés du cache"""
+    return json.dumps([limite.time, limite.depth, limite.nodes, limite.mate])
+
+
+class StockageAnalyses:
+    """
+    Analyses gardées sur disque (base SQLite) d'une exécution à l'autre.
+    Une ligne par position et limite : hash Zobrist, limite (cle_limite), nombre de lignes demandées
+    et lignes en JSON. L'ancienne table analyses, sans limite, n'est plus lue.
+    """
+    def __init__(self, fichier):
+        self.verrou = threading.Lock()
+        self.connexion = sqlite3.connect(fichier, check_same_thread=False)
+        with self.verrou, self.connexion:
+            self.connexion.execute("CREATE TABLE IF NOT EXISTS analyses_limites "
+                                   "(cle INTEGER, limite TEXT, multipv INTEGER, lignes TEXT, "
+                                   "PRIMARY KEY (cle, limite))")
+
+    @staticmethod
+    def _cle(cle):
+        # SQLite stocke des entiers signés sur 64 bits
+        return cle - (1 << 64) if cle >= (1 << 63) else cle
+
+    def lire(self, cle, limite):
+        with self.verrou:
+            ligne = self.connexion.execute("SELECT multipv, lignes FROM analyses_limites "
+                                           "WHERE cle = ? AND limite = ?", (self._cle(cle), limite)).fetchone()
+        if ligne is None:
+            return None
+        return ligne[0], json.loads(ligne[1])
+
+    def ecrire(self, cle, limite, multipv, lignes):
+        with self.verrou, self.connexion:
+            self.connexion.execute("INSERT OR REPLACE INTO analyses_limites VALUES (?, ?, ?, ?)",
+                                   (self._cle(cle), limite, multipv, json.dumps(lignes)))
+
+    def fermer(self):
+        with self.verrou:
+            self.connexion.close()
+
+
+class Analyses:
+    """
+    Analyses du moteur mémorisées par hash Zobrist de la position et limite de l'analyse, pour la
+    recherche de mat préalable (analyze_position) et l'expansion de MCTS : une position n'est analysée
+    qu'une fois par limite, quel que soit le nombre de visites du noeud (une analyse courte ne sert
+    pas à une demande plus profonde). Une entrée est (multipv, lignes), les lignes au format de
+    format_info ; elle sert à toute demande d'au plus multipv lignes.
+    Le cache mémoire (LRU) peut être doublé d'un stockage sur disque (CHESS_ANALYSES_DB).
+    Les analyses tournent en arrière-plan dans un pool de threads de la taille du pool de
+    moteurs, demander() rend la main tout de suite.
+    Pour les essais sans Stockfish : CHESS_ENGINE_PATH=./moteur_stub.py
+    """
+    def __init__(self, taille=TAILLE_CACHE_ANALYSES, limite=LIMITE_ANALYSE, multipv=MULTIPV_ANALYSE,
+                 nb_threads=ENGINE_POOL_SIZE, stockage=None):
+        self.taille = taille
+        self.limite = limite
+        self.multipv = multipv
+        self.nb_threads = max(1, nb_threads)
+        self.stockage = stockage
+        self.resultats = OrderedDict()
+        self.en_cours = {}
+        self.verrou = threading.Lock()
+        self.executeur = None
+        # Nombre d'analyses réellement demandées au moteur
+        self.appels = 0
+
+    def moteurs(self):
+        """Pool de moteurs, RessourceIndisponible si l'exécutable n'a pas pu être lancé"""
+        pool = registre.get("engines")
+        if pool.erreur is not None:
+            raise RessourceIndisponible(pool.commande) from pool.erreur
+        return pool
+
+    def _memoriser(self, cle, entree):
+        # Appelé avec le verrou
+        self.resultats[cle] = entree
+        self.resultats.move_to_end(cle)
+        while len(self.resultats) > self.taille:
+            self.resultats.popitem(last=False)
+
+    def _chercher(self, cle, multipv):
+        # Appelé avec le verrou : mémoire puis disque
+        entree = self.resultats.get(cle)
+        if entree is None and self.stockage is not None:
+            entree = self.stockage.lire(*cle)
+            if entree is not None:
+                self._memoriser(cle, entree)
+        if entree is None or entree[0] < multipv:
+            return None
+        self.resultats.move_to_end(cle)
+        return entree[1]
+
+    def cle(self, board, limite=None):
+        """Clé du cache : (hash Zobrist, cle_limite)"""
+        return cle_zobrist(board), cle_limite(limite or self.limite)
+
+    def resultat(self, board, multipv=1, limite=None):
+        """Lignes déjà connues pour cette position et cette limite, ou None"""
+        with self.verrou:
+            return self._chercher(self.cle(board, limite), multipv)
+
+    def _analyser(self, cle, board, multipv, limite):
+        debut = time.perf_counter()
+        infos = self.moteurs().analyse(board, limite, multipv=multipv)
+        mesures.observer("moteur_analyse_secondes", time.perf_counter() - debut)
+        mesures.incrementer("moteur_analyses")
+        lignes = [format_info(info) for info in infos]
+        with self.verrou:
+            self.appels += 1
+            self._memoriser(cle, (multipv, lignes))
+            # Une analyse en erreur reste dans en_cours pour que demander() relève l'erreur
+            self.en_cours.pop(cle, None)
+            stockage = self.stockage
+        if stockage is not None:
+            stockage.ecrire(*cle, multipv, lignes)
+        return lignes
+
+    def demander(self, board, multipv=None, limite=None):
+        """
+        Lignes de la position si elles sont connues. Sinon lance l'analyse (une seule fois par
+        position et limite) et renvoie None : il suffit de redemander plus tard. Les erreurs du moteur sont
+        relevées à l'appel qui suit la fin de l'analyse.
+        """
+        multipv = multipv or self.multipv
+        limite = limite or self.limite
+        cle = self.cle(board, limite)
+        with self.verrou:
+            lignes = self._chercher(cle, multipv)
+            if lignes is not None:
+                mesures.incrementer("analyses_cache_hits")
+                return lignes
+            future = self.en_cours.get(cle)
+            if future is None:
+                self.moteurs()
+                if self.executeur is None:
+                    self.executeur = ThreadPoolExecutor(max_workers=self.nb_threads, thread_name_prefix="analyse")
+                # Copie : le plateau de l'appelant continue d'être modifié pendant l'analyse
+                self.en_cours[cle] = self.executeur.submit(self._analyser, cle, board.copy(), multipv, limite)
+                return None
+            if not future.done():
+                return None
+            del self.en_cours[cle]
+        # Seule une analyse en erreur reste dans en_cours une fois terminée
+        future.result()
+        return None
+
+    def analyser(self, board, multipv=None, limite=None, timeout=None):
+        """Lignes de la position, en attendant la fin de l'analyse si besoin"""
+        cle = self.cle(board, limite)
+        while True:
+            lignes = self.demander(board, multipv, limite)
+            if lignes is not None:
+                return lignes
+            with self.verrou:
+                future = self.en_cours.get(cle)
+            if future is None:
+                continue
+            try:
+                future.result(timeout)
+            except Exception:
+                with self.verrou:
+                    self.en_cours.pop(cle, None)
+                raise
+
+    def clear(self):
+        with self.verrou:
+            self.resultats.clear()
+
+    def fermer(self):
+        with self.verrou:
+            executeur, self.executeur = self.executeur, None
+            stockage, self.stockage = self.stockage, None
+            self.en_cours.clear()
+        if executeur is not None:
+            executeur.shutdown(wait=False, cancel_futures=True)
+        if stockage is not None:
+            stockage.fermer()
+
+
+analyses = Analyses(stockage=StockageAnalyses(ANALYSES_DB) if ANALYSES_DB else None)
+a_la_sortie(analyses.fermer)
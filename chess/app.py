@@ -1,88 +1,379 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context, g
 from flask_cors import CORS
 from minimax import *
 from mcts import *
+from mcts_parallele import recherche_racine, mcts_feuilles, SuiviRacine, MODES, SEQUENTIEL, RACINE, FEUILLES
+from travaux import travaux, FileSaturee
+from parties import parties
+from positions import positions
+from instrumentation import mesures, journal
 import chess
 import json
-import ast
+import math
+import time
 
 app = Flask(__name__)
 CORS(app)
+# Les positions déjà calculées sont chargées en mémoire en arrière-plan, sans retarder les requêtes
+positions.prechauffer()
 
 iterations = 800
+# Mode de MCTS par défaut : sequentiel, racine (un arbre par processus) ou feuilles (simulations en parallèle)
+mode_mcts = SEQUENTIEL
+# Budget par défaut de minimax : sans temps ni noeuds, on cherche à profondeur fixe
+temps_minimax = None
+noeuds_minimax = None
+# Budget maximal accepté d'une requête, pour qu'une recherche n'occupe pas indéfiniment un processus
+temps_max = 30
+noeuds_max = 5000000
+profondeur_max = 8
+# Intervalle (en secondes) entre deux événements du flux de progression
+intervalle_flux = 0.25
 
-# Route pour jouer un coup
-@app.route('/play', methods=['POST'])
-def play_move():
-    move = request.form.get('move')
-    datas = request.form.get('coups')
-    if datas is None:
-        return jsonify({'error': 'Invalid data format'})
 
-    try:
-        coups = ast.literal_eval(datas)
-    except (SyntaxError, ValueError) as e:
-        return jsonify({'error': 'Invalid data format'})
-    ai = request.form.get('ai')
+class RequeteInvalide(Exception):
+    """Paramètre manquant ou invalide, le message est renvoyé au client"""
+
+
+def lire_donnees():
+    """Corps JSON de la requête, ou à défaut le formulaire (ancien format)"""
+    if request.is_json:
+        donnees = request.get_json(silent=True)
+        if not isinstance(donnees, dict):
+            raise RequeteInvalide('Invalid data format')
+        return donnees
+    return request.form
+
 
-    print(move)
+def lire_booleen(form, cle):
+    """Option oui/non de la requête : true, 1, "true" ou "1" (en formulaire tout arrive en texte), sinon non"""
+    valeur = form.get(cle)
+    if isinstance(valeur, str):
+        return valeur.strip().lower() in ("true", "1")
+    return valeur is True or (type(valeur) is int and valeur == 1)
+
+
+def lire_budget(form):
+    """
+    Budget de la recherche minimax transmis avec la requête (temps en secondes, noeuds, profondeur).
+    Une valeur non finie ou non positive est refusée, une valeur trop grande ramenée au maximum du serveur
+    """
     try:
-        print(coups)
-    except:
-        print("pas de coups")
-    
-    # Crée un objet d'échiquier
-    board = chess.Board(move)
-    coups1 = []
-    for coup in coups:
-        coups1.append(chess.Move.from_uci(coup))
-    
-    # Utilisez une des IA en Python pour calculer le mouvement de l'IA
-    
+        temps = float(form['temps']) if form.get('temps') not in (None, '') else temps_minimax
+        noeuds = int(form['noeuds']) if form.get('noeuds') not in (None, '') else noeuds_minimax
+        profondeur = int(form['profondeur']) if form.get('profondeur') not in (None, '') else None
+    except (TypeError, ValueError, OverflowError):
+        raise RequeteInvalide('Invalid budget')
+    for valeur in (temps, noeuds, profondeur):
+        if valeur is not None and not (math.isfinite(valeur) and valeur > 0):
+            raise RequeteInvalide('Invalid budget')
+    if temps is not None:
+        temps = min(temps, temps_max)
+    if noeuds is not None:
+        noeuds = min(noeuds, noeuds_max)
+    if profondeur is not None:
+        profondeur = min(profondeur, profondeur_max)
+    return temps, noeuds, profondeur
+
+
+def lire_recherche(donnees):
+    """IA, mode de MCTS et budget de minimax demandés"""
+    ai = donnees.get('ai')
+    if ai not in ("minimax", "mcts", "vs"):
+        raise RequeteInvalide('Invalid ai')
+    mode = donnees.get('parallele') or mode_mcts
+    if mode not in MODES:
+        raise RequeteInvalide('Invalid mode')
+    return ai, mode, lire_budget(donnees)
+
+
+def lancer(fonction, *args, asynchrone=False):
+    """
+    Soumet la recherche au pool de recherches, qui borne le nombre de recherches simultanées.
+    Renvoie le Travail une fois fini, ou tout de suite si asynchrone. Lève FileSaturee si le pool est plein.
+    """
+    travail = travaux.soumettre(fonction, *args)
+    if not asynchrone:
+        travail.future.result()
+    return travail
+
+
+def jouer_mcts(board, player, partie, mode, travail=None):
+    """
+    Recherche MCTS dans le mode demandé, en reprenant l'arbre de la recherche précédente si possible.
+    Un coup déjà calculé pour cette position avec au moins autant d'itérations est rejoué sans chercher
+    """
+    coup = positions.chercher(board, "mcts", iterations)
+    if coup is not None:
+        return coup
+    arret = None if travail is None else travail.arret
+    if mode == RACINE:
+        # Les arbres sont construits dans les processus : rien à garder pour le coup suivant
+        coup = coup_immediat(board)
+        if coup is not None:
+            return coup
+        suivi = SuiviRacine()
+        if travail is not None:
+            travail.suivi = suivi
+        statistiques = recherche_racine(board, iterations, player, arret=arret, suivi=suivi)
+        best_move = choisir_coup(statistiques)
+        memoriser_mcts(board, best_move, statistiques)
+        return best_move
+    root = cache_arbres.reprendre(board, player, partie) or Arbre(board)
+    if travail is not None:
+        travail.suivi = root
+    visites_avant = int(root.visits[Arbre.RACINE])
+    if mode == FEUILLES:
+        best_move = mcts_feuilles(root, board, iterations, player, arret=arret)
+    else:
+        best_move = mcts(root, board, iterations, player, arret)
+    # Un coup immédiat (livre, tables, mat) ne touche pas l'arbre : il n'est pas mémorisé
+    if root.visits[Arbre.RACINE] > visites_avant:
+        memoriser_mcts(board, best_move, statistiques_racine(root))
+    cache_arbres.memoriser(root, best_move, player, partie)
+    return best_move
+
+
+def memoriser_mcts(board, best_move, statistiques):
+    """Garde le coup d'une recherche MCTS avec son taux de victoire et le nombre réel de visites"""
+    victoires, visites = statistiques.get(str(best_move), (0.0, 0))
+    if visites:
+        positions.enregistrer(board, "mcts", best_move, victoires / visites,
+                              sum(visites for _, visites in statistiques.values()))
+
+
+def jouer_minimax(board, coups1, budget, travail=None):
+    """
+    Recherche minimax par approfondissement itératif avec le budget de la requête.
+    Pour une recherche à profondeur fixe, un coup déjà calculé pour cette position à une
+    profondeur suffisante est rejoué sans chercher. Un budget en temps ou en noeuds ne dit
+    pas quelle profondeur serait atteinte : la recherche est alors toujours faite
+    """
+    temps, noeuds, profondeur = budget
+    if temps is None and noeuds is None:
+        coup = positions.chercher(board, "minimax", profondeur or PROFONDEUR_DEFAUT)
+        if coup is not None:
+            return coup
+    recherche = Recherche(temps, noeuds, None if travail is None else travail.arret)
+    if travail is not None:
+        travail.suivi = recherche
+    best_move = recherche_iterative(board, coups1, temps, noeuds, profondeur, recherche)[1]
+    positions.enregistrer(board, "minimax", best_move, recherche.score, recherche.profondeur)
+    return best_move
+
+
+def joueur_humain(board):
+    """Couleur de l'adversaire de MCTS ("w" ou "b") : celle du camp qui n'est pas au trait"""
+    return "b" if board.turn == chess.WHITE else "w"
+
+
+def calculer_coup(board, coups1, ai, partie, mode, budget, travail=None):
+    """Coup de l'IA demandée, en notation UCI. Exécuté par le pool de recherches (voir travaux.py)"""
     if ai == "minimax":
         # Utilise l'algorithme Minimax pour trouver le meilleur mouvement
-        move_minimax = minimax(board, board.turn, board.turn, coups1)[1]
-        print(move_minimax)
+        move_minimax = jouer_minimax(board, coups1, budget, travail)
         # Applique le mouvement sur l'échiquier
         board.push(move_minimax)
         ai_move =  str(move_minimax)
     elif ai == "mcts":
         # Utilise l'algorithme MCTS pour trouver le meilleur mouvement
-        root = Node(board)
-        if len(coups)%2 !=0:
-            player = "w"
-        else:
-            player = "b"
-        print(player)
-        best_move = mcts(root, board, iterations, player)
-        print(best_move)
+        best_move = jouer_mcts(board, joueur_humain(board), partie, mode, travail)
         # Applique le mouvement sur l'échiquier
         board.push_san(str(best_move))
         ai_move =  str(best_move)
     elif ai == "vs":
-        if len(coups1)%2==0 or len(coups1)<= 10:
+        if board.turn == chess.WHITE or len(coups1)<= 10:
             # Utilise l'algorithme Minimax pour trouver le meilleur mouvement si le nombre de coups est pair ou inférieur à 10
-            move_minimax = minimax(board, board.turn, board.turn, coups1)[1]
-            print(move_minimax)
+            move_minimax = jouer_minimax(board, coups1, budget, travail)
             # Applique le mouvement sur l'échiquier
             board.push(move_minimax)
             ai_move =  str(move_minimax)
         else:
             # Utilise l'algorithme MCTS pour trouver le meilleur mouvement si le nombre de coups est impair et supérieur à 10
-            root = Node(board)
-            player = "b"
-            print(player)
-            best_move = mcts(root, board, iterations, player)
-            print(best_move)
+            best_move = jouer_mcts(board, joueur_humain(board), partie, mode, travail)
             # Applique le mouvement sur l'échiquier
             board.push_san(str(best_move))
             ai_move =  str(best_move)
+    mesures.incrementer("coups_calcules", ai=ai)
+    return ai_move
+
+
+# Route pour jouer un coup : position (move), coups joués depuis le début (coups) et IA (ai),
+# en JSON ou en formulaire. Avec asynchrone, la réponse est immédiate et contient
+# l'identifiant de la recherche (voir /play/<id>)
+@app.route('/play', methods=['POST'])
+def play_move():
+    try:
+        donnees = lire_donnees()
+        coups = donnees.get('coups')
+        if coups is None:
+            raise RequeteInvalide('Invalid data format')
+        if isinstance(coups, str):
+            coups = json.loads(coups)
+        # Identifiant facultatif de la partie, pour ne reprendre que les arbres MCTS de cette partie
+        partie = donnees.get('partie')
+        ai, mode, budget = lire_recherche(donnees)
+        # Crée un objet d'échiquier
+        board = chess.Board(donnees.get('move'))
+        coups1 = [chess.Move.from_uci(coup) for coup in coups]
+    except RequeteInvalide as e:
+        return jsonify({'error': str(e)})
+    except (ValueError, TypeError):
+        return jsonify({'error': 'Invalid data format'})
+
+    journal.debug("/play %s %s %s", ai, board.fen(), coups)
+
+    try:
+        travail = lancer(calculer_coup, board, coups1, ai, partie, mode, budget,
+                         asynchrone=lire_booleen(donnees, 'asynchrone'))
+    except FileSaturee:
+        return jsonify({'error': 'Too many searches'}), 503
+    if not travail.termine():
+        return jsonify(travail.description()), 202
+    if travail.erreur is not None:
+        return jsonify({'error': travail.erreur}), 500
 
     #ai_move =  str(board.fen()) 
 
-    response = {'ai_move': ai_move}
-    print("response :",response)
+    response = {'ai_move': travail.resultat}
+    journal.debug("/play réponse %s", response)
     return jsonify(response)
 
+
+def jouer_dans_partie(partie, ai, mode, budget, travail=None):
+    """Coup de l'IA dans une partie du serveur, joué ensuite sur son plateau"""
+    board = partie.board.copy()
+    ai_move = calculer_coup(board, list(board.move_stack), ai, partie.id, mode, budget, travail)
+    with partie.verrou:
+        partie.board.push_uci(ai_move)
+    return ai_move
+
+
+# Création d'une partie tenue par le serveur : JSON {fen, coups} facultatifs
+@app.route('/parties', methods=['POST'])
+def creer_partie():
+    try:
+        donnees = lire_donnees()
+        partie = parties.creer(donnees.get('fen'), donnees.get('coups') or ())
+    except RequeteInvalide as e:
+        return jsonify({'error': str(e)}), 400
+    except (ValueError, TypeError):
+        return jsonify({'error': 'Invalid position'}), 400
+    return jsonify(partie.description()), 201
+
+
+@app.route('/parties/<id>', methods=['GET'])
+def etat_partie(id):
+    partie = parties.get(id)
+    if partie is None:
+        return jsonify({'error': 'Unknown game'}), 404
+    return jsonify(partie.description())
+
+
+@app.route('/parties/<id>', methods=['DELETE'])
+def supprimer_partie(id):
+    partie = parties.supprimer(id)
+    if partie is None:
+        return jsonify({'error': 'Unknown game'}), 404
+    if partie.travail is not None:
+        partie.travail.annuler()
+    return jsonify(partie.description())
+
+
+# Coup dans une partie du serveur : JSON {coup, ai, ...}. Le coup du joueur (facultatif si
+# l'IA commence) est joué, puis celui de l'IA, comme pour /play
+@app.route('/parties/<id>/coup', methods=['POST'])
+def jouer_coup_partie(id):
+    partie = parties.get(id)
+    if partie is None:
+        return jsonify({'error': 'Unknown game'}), 404
+    try:
+        donnees = lire_donnees()
+        ai, mode, budget = lire_recherche(donnees)
+    except RequeteInvalide as e:
+        return jsonify({'error': str(e)}), 400
+    with partie.verrou:
+        if partie.occupee():
+            return jsonify({'error': 'Search in progress'}), 409
+        coup = donnees.get('coup')
+        if coup:
+            try:
+                partie.board.push(partie.board.parse_uci(coup))
+            except ValueError:
+                return jsonify({'error': 'Illegal move'}), 400
+        if partie.board.is_game_over():
+            return jsonify(dict(partie.description(), resultat=partie.board.result()))
+        try:
+            partie.travail = lancer(jouer_dans_partie, partie, ai, mode, budget, asynchrone=True)
+        except FileSaturee:
+            # Le coup du joueur sera renvoyé avec la prochaine requête
+            if coup:
+                partie.board.pop()
+            return jsonify({'error': 'Too many searches'}), 503
+    travail = partie.travail
+    if lire_booleen(donnees, 'asynchrone'):
+        return jsonify(dict(travail.description(), partie=partie.id)), 202
+    travail.future.result()
+    if travail.erreur is not None:
+        return jsonify({'error': travail.erreur}), 500
+    return jsonify(dict(partie.description(), ai_move=travail.resultat))
+
+
+# Etat d'une recherche asynchrone : résultat si elle est finie, sinon meilleur coup trouvé jusqu'ici
+@app.route('/play/<id>', methods=['GET'])
+def etat_recherche(id):
+    travail = travaux.get(id)
+    if travail is None:
+        return jsonify({'error': 'Unknown search'}), 404
+    return jsonify(travail.description())
+
+
+# Progression d'une recherche en Server-Sent Events : un événement "progression" par intervalle
+# (profondeur, meilleur coup, score, noeuds et noeuds/s pour minimax, visites de la racine pour MCTS)
+# puis un événement "fin" avec le résultat. Le client peut arrêter la recherche avec DELETE /play/<id>
+@app.route('/play/<id>/flux', methods=['GET'])
+def flux_recherche(id):
+    travail = travaux.get(id)
+    if travail is None:
+        return jsonify({'error': 'Unknown search'}), 404
+
+    def evenements():
+        while not travail.termine():
+            yield "event: progression\ndata: " + json.dumps(travail.progression()) + "\n\n"
+            time.sleep(intervalle_flux)
+        fin = dict(travail.progression(), **travail.description())
+        yield "event: fin\ndata: " + json.dumps(fin) + "\n\n"
+
+    return Response(stream_with_context(evenements()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+# Annulation d'une recherche : elle s'arrête et garde le meilleur coup trouvé
+@app.route('/play/<id>', methods=['DELETE'])
+def annuler_recherche(id):
+    travail = travaux.annuler(id)
+    if travail is None:
+        return jsonify({'error': 'Unknown search'}), 404
+    return jsonify(travail.description())
+
+# Durée et nombre des requêtes par route, pour /metrics
+@app.before_request
+def debut_requete():
+    g.debut = time.perf_counter()
+
+
+@app.after_request
+def fin_requete(response):
+    route = request.url_rule.rule if request.url_rule is not None else "inconnue"
+    mesures.observer("requete_secondes", time.perf_counter() - g.debut, route=route, methode=request.method)
+    mesures.incrementer("requetes", route=route, methode=request.method, statut=response.status_code)
+    return response
+
+
+# Compteurs et histogrammes au format texte de Prometheus
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(mesures.texte(), mimetype='text/plain; version=0.0.4')
+
 if __name__ == '__main__':
     app.run(port=5000)
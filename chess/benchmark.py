@@ -0,0 +1,218 @@
+"""
+Banc d'essai des recherches sur une suite fixe de positions (tactiques, calmes, finales) :
+    python benchmark.py --sortie resultats.json
+    python benchmark.py --comparer ancien.json --sortie nouveau.json
+Pour chaque position, minimax tourne à profondeur fixe et MCTS à nombre d'itérations fixe.
+On mesure les noeuds (les itérations pour MCTS), les noeuds/s, le temps, le temps jusqu'à la
+solution, le pic mémoire (tracemalloc, dans une seconde exécution pour ne pas fausser les temps)
+et si le coup trouvé fait partie des meilleurs coups attendus (bm).
+"""
+import argparse
+import json
+import platform
+import random
+import subprocess
+import time
+import tracemalloc
+import chess
+import minimax
+import mcts
+
+
+# bm : coups attendus (en UCI), None pour une position sans solution unique
+SUITE = [
+    {"nom": "mat-1-berger", "categorie": "tactique", "bm": ["h5f7"],
+     "fen": "r1bqkb1r/pppp1ppp/2n2n2/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR w KQkq - 4 4"},
+    {"nom": "mat-1-couloir", "categorie": "tactique", "bm": ["d1d8"],
+     "fen": "6k1/5ppp/8/8/8/8/5PPP/3R2K1 w - - 0 1"},
+    {"nom": "mat-2-tranquille", "categorie": "tactique", "bm": ["h2h4"],
+     "fen": "5Q2/8/4r1p1/6kp/qP6/3B1P2/3K2PP/8 w - - 0 1"},
+    {"nom": "mat-2-etouffe", "categorie": "tactique", "bm": ["b3g8"],
+     "fen": "r6k/6pp/7N/8/8/1Q6/6PP/6K1 w - - 0 1"},
+    {"nom": "mat-3", "categorie": "tactique",
+     "bm": ["h8g7", "h8f6", "h8e5", "h8d4", "h8c3", "e8f8", "e8d8", "e8c8", "e8b8", "e8a8"],
+     "fen": "4R2B/5N1k/6pP/6P1/8/1p6/1p6/QK6 w - - 0 1"},
+    {"nom": "depart", "categorie": "calme", "bm": None,
+     "fen": chess.STARTING_FEN},
+    {"nom": "italienne", "categorie": "calme", "bm": None,
+     "fen": "r1bqkb1r/pppp1ppp/2n2n2/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4"},
+    {"nom": "gambit-dame", "categorie": "calme", "bm": None,
+     "fen": "r2q1rk1/pp2bppp/2n1pn2/2pp4/3P1B2/2PBPN2/PP1N1PPP/R2QK2R w KQ - 0 9"},
+    {"nom": "dame-roi", "categorie": "finale", "bm": ["g1g7"],
+     "fen": "7k/8/5K2/8/8/8/8/6Q1 w - - 0 1"},
+    {"nom": "tour-roi", "categorie": "finale", "bm": ["h1h8"],
+     "fen": "k7/8/1K6/8/8/8/8/7R w - - 0 1"},
+    {"nom": "promotion", "categorie": "finale", "bm": ["e7e8q"],
+     "fen": "8/4P3/8/8/8/8/k7/4K3 w - - 0 1"},
+    {"nom": "opposition", "categorie": "finale", "bm": None,
+     "fen": "8/8/8/4k3/8/4K3/4P3/8 w - - 0 1"},
+    {"nom": "tours", "categorie": "finale", "bm": None,
+     "fen": "8/5k2/8/8/8/3K4/4R3/r7 w - - 0 1"},
+]
+
+PROFONDEUR = 4
+ITERATIONS = 400
+# Nombre de points où l'on regarde le coup de MCTS pour le temps jusqu'à la solution
+POINTS_MCTS = 20
+GRAINE = 0
+
+
+def temps_solution(historique, bm):
+    """Temps à partir duquel le coup choisi reste dans bm jusqu'à la fin, None sinon"""
+    if not bm:
+        return None
+    temps = None
+    for coup, instant in historique:
+        if str(coup) in bm:
+            if temps is None:
+                temps = instant
+        else:
+            temps = None
+    return temps
+
+
+def chercher_minimax(position, profondeur):
+    board = chess.Board(position["fen"])
+    minimax.transposition_table.clear()
+    recherche = minimax.Recherche()
+    debut = time.perf_counter()
+    score, coup = minimax.recherche_iterative(board, board.move_stack, depth_max=profondeur,
+                                              recherche=recherche, livre_ouvertures=False)
+    temps = time.perf_counter() - debut
+    historique = [(iteration[2], iteration[4]) for iteration in recherche.iterations]
+    return {"coup": str(coup), "score": score, "noeuds": recherche.noeuds, "temps": temps,
+            "temps_solution": temps_solution(historique, position["bm"])}
+
+
+def chercher_mcts(position, iterations):
+    board = chess.Board(position["fen"])
+    # L'IA joue le camp au trait, player est le camp adverse
+    player = "b" if board.turn == chess.WHITE else "w"
+    random.seed(GRAINE)
+    arbre = mcts.Arbre(board)
+    pas = max(1, iterations // POINTS_MCTS)
+    historique = []
+    faites = 0
+    debut = time.perf_counter()
+    while faites < iterations:
+        n = min(pas, iterations - faites)
+        mcts.iterer(arbre, board, n, player)
+        faites += n
+        historique.append((arbre.meilleur_coup(), time.perf_counter() - debut))
+    temps = time.perf_counter() - debut
+    return {"coup": str(arbre.meilleur_coup()), "noeuds": faites, "taille_arbre": arbre.taille, "temps": temps,
+            "temps_solution": temps_solution(historique, position["bm"])}
+
+
+def memoire(fonction, *args):
+    """Pic d'allocation (en Mo) pendant fonction(*args)"""
+    tracemalloc.start()
+    try:
+        fonction(*args)
+        return tracemalloc.get_traced_memory()[1] / 2**20
+    finally:
+        tracemalloc.stop()
+
+
+def completer(resultat, position):
+    resultat["nps"] = int(resultat["noeuds"] / resultat["temps"]) if resultat["temps"] > 0 else 0
+    resultat["correct"] = None if not position["bm"] else resultat["coup"] in position["bm"]
+    return resultat
+
+
+def lancer(suite=SUITE, profondeur=PROFONDEUR, iterations=ITERATIONS, algos=("minimax", "mcts"), mesure_memoire=True):
+    resultats = []
+    for position in suite:
+        for algo in algos:
+            if algo == "minimax":
+                fonction, parametre = chercher_minimax, profondeur
+            else:
+                fonction, parametre = chercher_mcts, iterations
+            resultat = completer(fonction(position, parametre), position)
+            if mesure_memoire:
+                resultat["memoire_mo"] = round(memoire(fonction, position, parametre), 2)
+            resultat.update({"position": position["nom"], "categorie": position["categorie"], "algo": algo})
+            resultats.append(resultat)
+            afficher(resultat)
+    return resultats
+
+
+def totaux(resultats):
+    totaux = {}
+    for algo in sorted({resultat["algo"] for resultat in resultats}):
+        lignes = [resultat for resultat in resultats if resultat["algo"] == algo]
+        notees = [resultat for resultat in lignes if resultat["correct"] is not None]
+        noeuds = sum(resultat["noeuds"] for resultat in lignes)
+        temps = sum(resultat["temps"] for resultat in lignes)
+        totaux[algo] = {"noeuds": noeuds, "temps": temps, "nps": int(noeuds / temps) if temps > 0 else 0,
+                        "correct": sum(resultat["correct"] for resultat in notees), "notees": len(notees)}
+    return totaux
+
+
+def commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def afficher(resultat):
+    correct = {True: "ok", False: "FAUX", None: "-"}[resultat["correct"]]
+    solution = resultat["temps_solution"]
+    print(f"{resultat['algo']:8} {resultat['position']:18} {resultat['coup']:6} {correct:5} "
+          f"{resultat['noeuds']:9} noeuds {resultat['nps']:8} n/s {resultat['temps']:7.3f} s "
+          f"solution {'-' if solution is None else f'{solution:.3f} s':>9} "
+          f"{resultat.get('memoire_mo', '-')} Mo")
+
+
+def comparer(ancien, nouveau):
+    """Rapport de nps et changements de correction entre deux fichiers de résultats"""
+    anciens = {(resultat["algo"], resultat["position"]): resultat for resultat in ancien["resultats"]}
+    print(f"comparaison {ancien.get('commit')} -> {nouveau.get('commit')}")
+    for resultat in nouveau["resultats"]:
+        avant = anciens.get((resultat["algo"], resultat["position"]))
+        if avant is None:
+            continue
+        rapport = resultat["nps"] / avant["nps"] if avant["nps"] else float("inf")
+        changement = "" if avant["correct"] == resultat["correct"] else f" correct {avant['correct']} -> {resultat['correct']}"
+        print(f"{resultat['algo']:8} {resultat['position']:18} nps x{rapport:5.2f} "
+              f"noeuds {avant['noeuds']} -> {resultat['noeuds']}{changement}")
+    for algo, total in nouveau["totaux"].items():
+        avant = ancien["totaux"].get(algo)
+        if avant and avant["nps"]:
+            print(f"{algo:8} total nps x{total['nps'] / avant['nps']:.2f}, "
+                  f"correct {avant['correct']}/{avant['notees']} -> {total['correct']}/{total['notees']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--profondeur", type=int, default=PROFONDEUR)
+    parser.add_argument("--iterations", type=int, default=ITERATIONS)
+    parser.add_argument("--algo", choices=("minimax", "mcts"), action="append")
+    parser.add_argument("--suite", help="fichier JSON d'une autre suite (liste de {nom, categorie, fen, bm})")
+    parser.add_argument("--sans-memoire", action="store_true")
+    parser.add_argument("--sortie", help="fichier JSON où enregistrer les résultats")
+    parser.add_argument("--comparer", help="fichier JSON de résultats précédents")
+    args = parser.parse_args()
+
+    suite = SUITE
+    if args.suite:
+        with open(args.suite) as fp:
+            suite = json.load(fp)
+    # Recherche de l'adversaire sans attendre le moteur, pour des résultats reproductibles
+    mcts.EXPANSION_ASYNCHRONE = False
+    resultats = lancer(suite, args.profondeur, args.iterations, tuple(args.algo or ("minimax", "mcts")),
+                       not args.sans_memoire)
+    rapport = {"commit": commit(), "date": time.strftime("%Y-%m-%d %H:%M:%S"), "python": platform.python_version(),
+               "profondeur": args.profondeur, "iterations": args.iterations,
+               "resultats": resultats, "totaux": totaux(resultats)}
+    for algo, total in rapport["totaux"].items():
+        print(f"{algo:8} total {total['noeuds']} noeuds en {total['temps']:.2f} s, {total['nps']} n/s, "
+              f"correct {total['correct']}/{total['notees']}")
+    if args.sortie:
+        with open(args.sortie, "w") as fp:
+            json.dump(rapport, fp, indent=2)
+    if args.comparer:
+        with open(args.comparer) as fp:
+            comparer(json.load(fp), rapport)
@@ -0,0 +1,282 @@
+import chess
+import numpy as np
+
+
+# Valeur des pièces indexée par piece_type (None, pion, cavalier, fou, tour, dame, roi)
+# Les rois sont toujours présents des deux côtés, leur valeur s'annule : on met 0
+VALEURS_MINIMAX = (0, 10, 30, 30, 50, 90, 0)
+VALEURS_MCTS = (0, 1, 3, 3, 5, 9, 0)
+
+
+def materiel(board, valeurs=VALEURS_MINIMAX):
+    """
+    Différence de matériel blancs - noirs.
+    Calculée directement sur les bitboards du plateau (un popcount par type de pièce et par couleur)
+    au lieu de parcourir board_fen() ou piece_map().
+    """
+    blancs = board.occupied_co[chess.WHITE]
+    noirs = board.occupied_co[chess.BLACK]
+    score = 0
+    for bitboard, valeur in ((board.pawns, valeurs[chess.PAWN]), (board.knights, valeurs[chess.KNIGHT]),
+                             (board.bishops, valeurs[chess.BISHOP]), (board.rooks, valeurs[chess.ROOK]),
+                             (board.queens, valeurs[chess.QUEEN])):
+        score += valeur * (chess.popcount(bitboard & blancs) - chess.popcount(bitboard & noirs))
+    return score
+
+
+class Evaluation:
+    """
+    Interface commune des fonctions d'évaluation utilisées par les moteurs.
+    evaluer(board) renvoie un score du point de vue des blancs.
+    """
+    def evaluer(self, board):
+        raise NotImplementedError
+
+
+class EvaluationMateriel(Evaluation):
+    """Matériel seul, avec les valeurs de pièces du moteur"""
+    def __init__(self, valeurs=VALEURS_MINIMAX):
+        self.valeurs = valeurs
+
+    def evaluer(self, board):
+        return materiel(board, self.valeurs)
+
+
+# Tables pièce-case (PeSTO), en centipions, écrites du point de vue des blancs
+# avec la 8e rangée en premier : la case a8 est à l'indice 0, h1 à l'indice 63
+MG_VALEURS = (0, 82, 337, 365, 477, 1025, 0)
+EG_VALEURS = (0, 94, 281, 297, 512, 936, 0)
+
+MG_PAWN = (
+      0,   0,   0,   0,   0,   0,   0,   0,
+     98, 134,  61,  95,  68, 126,  34, -11,
+     -6,   7,  26,  31,  65,  56,  25, -20,
+    -14,  13,   6,  21,  23,  12,  17, -23,
+    -27,  -2,  -5,  12,  17,   6,  10, -25,
+    -26,  -4,  -4, -10,   3,   3,  33, -12,
+    -35,  -1, -20, -23, -15,  24,  38, -22,
+      0,   0,   0,   0,   0,   0,   0,   0,
+)
+EG_PAWN = (
+      0,   0,   0,   0,   0,   0,   0,   0,
+    178, 173, 158, 134, 147, 132, 165, 187,
+     94, 100,  85,  67,  56,  53,  82,  84,
+     32,  24,  13,   5,  -2,   4,  17,  17,
+     13,   9,  -3,  -7,  -7,  -8,   3,  -1,
+      4,   7,  -6,   1,   0,  -5,  -1,  -8,
+     13,   8,   8,  10,  13,   0,   2,  -7,
+      0,   0,   0,   0,   0,   0,   0,   0,
+)
+MG_KNIGHT = (
+    -167, -89, -34, -49,  61, -97, -15, -107,
+     -73, -41,  72,  36,  23,  62,   7,  -17,
+     -47,  60,  37,  65,  84, 129,  73,   44,
+      -9,  17,  19,  53,  37,  69,  18,   22,
+     -13,   4,  16,  13,  28,  19,  21,   -8,
+     -23,  -9,  12,  10,  19,  17,  25,  -16,
+     -29, -53, -12,  -3,  -1,  18, -14,  -19,
+    -105, -21, -58, -33, -17, -28, -19,  -23,
+)
+EG_KNIGHT = (
+    -58, -38, -13, -28, -31, -27, -63, -99,
+    -25,  -8, -25,  -2,  -9, -25, -24, -52,
+    -24, -20,  10,   9,  -1,  -9, -19, -41,
+    -17,   3,  22,  22,  22,  11,   8, -18,
+    -18,  -6,  16,  25,  16,  17,   4, -18,
+    -23,  -3,  -1,  15,  10,  -3, -20, -22,
+    -42, -20, -10,  -5,  -2, -20, -23, -44,
+    -29, -51, -23, -15, -22, -18, -50, -64,
+)
+MG_BISHOP = (
+    -29,   4, -82, -37, -25, -42,   7,  -8,
+    -26,  16, -18, -13,  30,  59,  18, -47,
+    -16,  37,  43,  40,  35,  50,  37,  -2,
+     -4,   5,  19,  50,  37,  37,   7,  -2,
+     -6,  13,  13,  26,  34,  12,  10,   4,
+      0,  15,  15,  15,  14,  27,  18,  10,
+      4,  15,  16,   0,   7,  21,  33,   1,
+    -33,  -3, -14, -21, -13, -12, -39, -21,
+)
+EG_BISHOP = (
+    -14, -21, -11,  -8,  -7,  -9, -17, -24,
+     -8,  -4,   7, -12,  -3, -13,  -4, -14,
+      2,  -8,   0,  -1,  -2,   6,   0,   4,
+     -3,   9,  12,   9,  14,  10,   3,   2,
+     -6,   3,  13,  19,   7,  10,  -3,  -9,
+    -12,  -3,   8,  10,  13,   3,  -7, -15,
+    -14, -18,  -7,  -1,   4,  -9, -15, -27,
+    -23,  -9, -23,  -5,  -9, -16,  -5, -17,
+)
+MG_ROOK = (
+     32,  42,  32,  51,  63,   9,  31,  43,
+     27,  32,  58,  62,  80,  67,  26,  44,
+     -5,  19,  26,  36,  17,  45,  61,  16,
+    -24, -11,   7,  26,  24,  35,  -8, -20,
+    -36, -26, -12,  -1,   9,  -7,   6, -23,
+    -45, -25, -16, -17,   3,   0,  -5, -33,
+    -44, -16, -20,  -9,  -1,  11,  -6, -71,
+    -19, -13,   1,  17,  16,   7, -37, -26,
+)
+EG_ROOK = (
+     13,  10,  18,  15,  12,  12,   8,   5,
+     11,  13,  13,  11,  -3,   3,   8,   3,
+      7,   7,   7,   5,   4,  -3,  -5,  -3,
+      4,   3,  13,   1,   2,   1,  -1,   2,
+      3,   5,   8,   4,  -5,  -6,  -8, -11,
+     -4,   0,  -5,  -1,  -7, -12,  -8, -16,
+     -6,  -6,   0,   2,  -9,  -9, -11,  -3,
+     -9,   2,   3,  -1,  -5, -13,   4, -20,
+)
+MG_QUEEN = (
+    -28,   0,  29,  12,  59,  44,  43,  45,
+    -24, -39,  -5,   1, -16,  57,  28,  54,
+    -13, -17,   7,   8,  29,  56,  47,  57,
+    -27, -27, -16, -16,  -1,  17,  -2,   1,
+     -9, -26,  -9, -10,  -2,  -4,   3,  -3,
+    -14,   2, -11,  -2,  -5,   2,  14,   5,
+    -35,  -8,  11,   2,   8,  15,  -3,   1,
+     -1, -18,  -9,  10, -15, -25, -31, -50,
+)
+EG_QUEEN = (
+     -9,  22,  22,  27,  27,  19,  10,  20,
+    -17,  20,  32,  41,  58,  25,  30,   0,
+    -20,   6,   9,  49,  47,  35,  19,   9,
+      3,  22,  24,  45,  57,  40,  57,  36,
+    -18,  28,  19,  47,  31,  34,  39,  23,
+    -16, -27,  15,   6,   9,  17,  10,   5,
+    -22, -23, -30, -16, -16, -23, -36, -32,
+    -33, -28, -22, -43,  -5, -32, -20, -41,
+)
+MG_KING = (
+    -65,  23,  16, -15, -56, -34,   2,  13,
+     29,  -1, -20,  -7,  -8,  -4, -38, -29,
+     -9,  24,   2, -16, -20,   6,  22, -22,
+    -17, -20, -12, -27, -30, -25, -14, -36,
+    -49,  -1, -27, -39, -46, -44, -33, -51,
+    -14, -14, -22, -46, -44, -30, -15, -27,
+      1,   7,  -8, -64, -43, -16,   9,   8,
+    -15,  36,  12, -54,   8, -28,  24,  14,
+)
+EG_KING = (
+    -74, -35, -18, -18, -11,  15,   4, -17,
+    -12,  17,  14,  17,  17,  38,  23,  11,
+     10,  17,  23,  15,  20,  45,  44,  13,
+     -8,  22,  24,  27,  26,  33,  26,   3,
+    -18,  -4,  21,  24,  27,  23,   9, -11,
+    -19,  -3,  11,  21,  23,  16,   7,  -9,
+    -27, -11,   4,  13,  14,   4,  -5, -17,
+    -53, -34, -21, -11, -28, -14, -24, -43,
+)
+
+MG_TABLES = (None, MG_PAWN, MG_KNIGHT, MG_BISHOP, MG_ROOK, MG_QUEEN, MG_KING)
+EG_TABLES = (None, EG_PAWN, EG_KNIGHT, EG_BISHOP, EG_ROOK, EG_QUEEN, EG_KING)
+
+# Poids de chaque pièce dans le calcul de la phase de jeu (24 = toutes les pièces, 0 = finale de pions)
+PHASE_PIECE = (0, 0, 1, 1, 2, 4, 0)
+PHASE_MAX = 24
+
+
+def _table_case(table, valeur, couleur):
+    """Table indexée par les cases de python-chess (a1 = 0), valeur de la pièce incluse"""
+    if couleur == chess.WHITE:
+        return tuple(valeur + table[square ^ 56] for square in chess.SQUARES)
+    # Pour les noirs, la table lue depuis la 8e rangée correspond directement à a1 = 0
+    return tuple(valeur + table[square] for square in chess.SQUARES)
+
+
+class EvaluationTapered(Evaluation):
+    """
+    Matériel + tables pièce-case de milieu et de fin de partie, mélangées selon la phase de jeu.
+    Le score en centipions est multiplié par `echelle` (0.1 pour l'échelle de minimax, pion = 10).
+    """
+    def __init__(self, echelle=1.0):
+        self.echelle = echelle
+        self.mg = {couleur: [None] + [_table_case(MG_TABLES[t], MG_VALEURS[t], couleur) for t in chess.PIECE_TYPES]
+                   for couleur in chess.COLORS}
+        self.eg = {couleur: [None] + [_table_case(EG_TABLES[t], EG_VALEURS[t], couleur) for t in chess.PIECE_TYPES]
+                   for couleur in chess.COLORS}
+        self._poids = None
+
+    def evaluer(self, board):
+        mg = 0
+        eg = 0
+        phase = 0
+        pieces = (board.pawns, board.knights, board.bishops, board.rooks, board.queens, board.kings)
+        for couleur, signe in ((chess.WHITE, 1), (chess.BLACK, -1)):
+            occupees = board.occupied_co[couleur]
+            mg_couleur = self.mg[couleur]
+            eg_couleur = self.eg[couleur]
+            for piece_type, bitboard in zip(chess.PIECE_TYPES, pieces):
+                table_mg = mg_couleur[piece_type]
+                table_eg = eg_couleur[piece_type]
+                for square in chess.scan_forward(bitboard & occupees):
+                    mg += signe * table_mg[square]
+                    eg += signe * table_eg[square]
+                    phase += PHASE_PIECE[piece_type]
+        phase = min(phase, PHASE_MAX)
+        return (mg * phase + eg * (PHASE_MAX - phase)) / PHASE_MAX * self.echelle
+
+    def poids(self):
+        """Tables sous forme de tableaux NumPy (2, 12, 64) pour evaluer_batch, calculées une fois"""
+        if self._poids is None:
+            poids = np.zeros((2, 12, 64), dtype=np.float64)
+            for i, (couleur, signe) in enumerate(((chess.WHITE, 1), (chess.BLACK, -1))):
+                for piece_type in chess.PIECE_TYPES:
+                    poids[0, i * 6 + piece_type - 1] = signe * np.array(self.mg[couleur][piece_type])
+                    poids[1, i * 6 + piece_type - 1] = signe * np.array(self.eg[couleur][piece_type])
+            self._poids = poids.reshape(2, 12 * 64)
+        return self._poids
+
+    def evaluer_batch(self, tableau):
+        """
+        Évalue N positions d'un coup à partir d'un tableau (N, 12) de bitboards uint64
+        (voir bitboards_batch). Renvoie un tableau (N,) de scores du point de vue des blancs.
+        """
+        tableau = np.ascontiguousarray(tableau, dtype='<u8')
+        # (N, 12) uint64 -> (N, 768) bits, le bit 64 * i + case correspondant à la case du bitboard i
+        bits = np.unpackbits(tableau.view(np.uint8), axis=1, bitorder='little').astype(np.float64)
+        poids = self.poids()
+        mg = bits @ poids[0]
+        eg = bits @ poids[1]
+        nb_pieces = bits.reshape(-1, 12, 64).sum(axis=2)
+        phase = np.minimum(nb_pieces @ np.array(PHASE_PIECE[1:] * 2, dtype=np.float64), PHASE_MAX)
+        return (mg * phase + eg * (PHASE_MAX - phase)) / PHASE_MAX * self.echelle
+
+
+def bitboards(board):
+    """Les 12 bitboards d'un plateau : pion, cavalier, fou, tour, dame, roi blancs puis noirs"""
+    return [board.pieces_mask(piece_type, couleur) for couleur in (chess.WHITE, chess.BLACK) for piece_type in chess.PIECE_TYPES]
+
+
+def bitboards_batch(boards):
+    """Tableau (N, 12) uint64 des bitboards de plusieurs plateaux, à passer à evaluer_batch"""
+    return np.array([bitboards(board) for board in boards], dtype=np.uint64).reshape(-1, 12)
+
+
+def bitboards_enfants(board, moves):
+    """
+    Tableau (N, 12) uint64 des bitboards des positions obtenues après chacun des coups, calculés
+    à partir de ceux de board sans jouer les coups (seuls le roque et la prise en passant,
+    qui déplacent une seconde pièce, passent par push/pop)
+    """
+    base = bitboards(board)
+    nous = 0 if board.turn == chess.WHITE else 6
+    eux = 6 - nous
+    lignes = []
+    for move in moves:
+        if board.is_castling(move) or board.is_en_passant(move):
+            board.push(move)
+            lignes.append(bitboards(board))
+            board.pop()
+            continue
+        ligne = list(base)
+        depart = chess.BB_SQUARES[move.from_square]
+        arrivee = chess.BB_SQUARES[move.to_square]
+        victime = board.piece_type_at(move.to_square)
+        if victime is not None:
+            ligne[eux + victime - 1] &= ~arrivee
+        piece = board.piece_type_at(move.from_square)
+        ligne[nous + piece - 1] &= ~depart
+        ligne[nous + (move.promotion or piece) - 1] |= arrivee
+        lignes.append(ligne)
+    return np.array(lignes, dtype=np.uint64).reshape(-1, 12)
@@ -0,0 +1,148 @@
+import threading
+from collections import OrderedDict
+import chess
+from transposition import cle_zobrist
+from ressources import registre, RessourceIndisponible
+from instrumentation import mesures
+
+
+# Nombre de résultats de sondage gardés en mémoire
+TAILLE_CACHE_FINALES = 200000
+
+
+class Finales:
+    """
+    Sondage des tables de finales Syzygy (CHESS_SYZYGY), ouvertes une seule fois par processus
+    (ressource "tables_finales"). Les résultats WDL et DTZ sont mis en cache (LRU) par hash Zobrist.
+    Sans tables configurées, chaque méthode renvoie None après un simple test.
+    Les sondages sont comptés par thread, sans verrou ni mesures par noeud : la recherche
+    qui les a faits les publie une fois finie (publier). Un processus de MCTS relève les siens
+    avec son résultat, le processus serveur les ajoute aux siens avant de publier.
+    WDL du point de vue du camp au trait : 2 gain, 1 gain annulé par la règle des 50 coups,
+    0 nulle, -1 perte sauvée par la règle des 50 coups, -2 perte.
+    """
+    def __init__(self, taille=TAILLE_CACHE_FINALES):
+        self.taille = taille
+        self.cache = OrderedDict()
+        self.verrou = threading.Lock()
+        self.tables = None
+        self.pieces_max = None
+        self.local = threading.local()
+
+    def pieces(self):
+        """Nombre maximal de pièces des tables disponibles (0 sans tables)"""
+        if self.pieces_max is None:
+            try:
+                self.tables = registre.get("tables_finales")
+                # Clés de la forme "KQvK" : nombre de pièces = longueur moins le "v"
+                self.pieces_max = max(len(cle) - 1 for cle in self.tables.wdl)
+            except RessourceIndisponible:
+                self.pieces_max = 0
+        return self.pieces_max
+
+    def applicable(self, board):
+        """Vrai si la position peut être dans les tables (assez peu de pièces, plus de roque)"""
+        return chess.popcount(board.occupied) <= self.pieces() and not board.castling_rights
+
+    def _compteurs(self):
+        # Sondages du thread courant depuis la dernière publication
+        compteurs = getattr(self.local, "compteurs", None)
+        if compteurs is None:
+            compteurs = self.local.compteurs = {"cache": 0, "wdl": 0, "dtz": 0}
+        return compteurs
+
+    def relever(self):
+        """Sondages faits par ce thread depuis la dernière publication, remis à zéro"""
+        compteurs = self._compteurs()
+        self.local.compteurs = None
+        return compteurs
+
+    def ajouter(self, compteurs):
+        """Ajoute à ce thread des sondages relevés ailleurs (dans un processus de MCTS)"""
+        mes_compteurs = self._compteurs()
+        for nature, n in compteurs.items():
+            mes_compteurs[nature] += n
+
+    def publier(self):
+        """Ajoute aux mesures les sondages faits par ce thread, à appeler une fois par recherche"""
+        compteurs = self.relever()
+        if compteurs["cache"]:
+            mesures.incrementer("finales_cache_hits", compteurs["cache"])
+        for nature in ("wdl", "dtz"):
+            if compteurs[nature]:
+                mesures.incrementer("finales_sondages", compteurs[nature], nature=nature)
+
+    def _sonder(self, board, nature):
+        if not self.applicable(board):
+            return None
+        cle = (nature, cle_zobrist(board))
+        compteurs = self._compteurs()
+        with self.verrou:
+            if cle in self.cache:
+                self.cache.move_to_end(cle)
+                compteurs["cache"] += 1
+                return self.cache[cle]
+        resultat = self.tables.get_wdl(board) if nature == "wdl" else self.tables.get_dtz(board)
+        compteurs[nature] += 1
+        with self.verrou:
+            self.cache[cle] = resultat
+            while len(self.cache) > self.taille:
+                self.cache.popitem(last=False)
+        return resultat
+
+    def wdl(self, board):
+        """WDL de la position, None si elle n'est pas dans les tables"""
+        return self._sonder(board, "wdl")
+
+    def dtz(self, board):
+        """Distance au prochain coup de pion ou à la prochaine prise (signée comme wdl), ou None"""
+        return self._sonder(board, "dtz")
+
+    def meilleur_coup(self, board):
+        """
+        Coup parfait d'après les tables : (coup, wdl de board), ou (None, None) hors des tables.
+        On gagne au plus court (en DTZ), on perd au plus long ; un mat immédiat passe avant tout.
+        Appelé une fois par recherche, avant de chercher : ses sondages sont publiés tout de suite.
+        """
+        try:
+            return self._meilleur_coup(board)
+        finally:
+            self.publier()
+
+    def _meilleur_coup(self, board):
+        if not self.applicable(board):
+            return None, None
+        meilleur, meilleure_cle = None, None
+        for move in board.legal_moves:
+            board.push(move)
+            try:
+                if board.is_checkmate():
+                    cle = (3, 0)
+                else:
+                    wdl, dtz = self.wdl(board), self.dtz(board)
+                    if wdl is None or dtz is None:
+                        return None, None
+                    # Valeurs du point de vue de l'adversaire, désormais au trait
+                    wdl = -wdl
+                    cle = (wdl, -abs(dtz) if wdl > 0 else abs(dtz))
+            finally:
+                board.pop()
+            if meilleure_cle is None or cle > meilleure_cle:
+                meilleur, meilleure_cle = move, cle
+        if meilleur is None:
+            return None, None
+        return meilleur, min(meilleure_cle[0], 2)
+
+    def recompense(self, board, ia_blancs):
+        """Récompense de MCTS (+1, 0, -1 du point de vue de l'IA) d'après les tables, ou None"""
+        wdl = self.wdl(board)
+        if wdl is None:
+            return None
+        if abs(wdl) < 2:
+            # Gain ou perte annulés par la règle des 50 coups
+            return 0
+        gagnant_blancs = board.turn if wdl > 0 else not board.turn
+        return 1 if gagnant_blancs == ia_blancs else -1
+
+
+finales = Finales()
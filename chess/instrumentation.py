@@ -0,0 +1,119 @@
+import bisect
+import contextlib
+import logging
+import threading
+import time
+from ressources import METRIQUES, NIVEAU_LOG
+
+
+# Journal du serveur et des recherches : rien n'est écrit tant que CHESS_LOG n'est pas défini
+journal = logging.getLogger("iachess")
+if NIVEAU_LOG:
+    journal.setLevel(NIVEAU_LOG.upper())
+    gestionnaire = logging.StreamHandler()
+    gestionnaire.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(threadName)s %(message)s"))
+    journal.addHandler(gestionnaire)
+else:
+    journal.setLevel(logging.WARNING)
+
+# Bornes (en secondes) des histogrammes de durées
+BORNES_DUREES = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class Histogramme:
+    def __init__(self, bornes=BORNES_DUREES):
+        self.bornes = bornes
+        self.comptes = [0] * (len(bornes) + 1)
+        self.somme = 0.0
+        self.nombre = 0
+
+    def observer(self, valeur):
+        self.comptes[bisect.bisect_left(self.bornes, valeur)] += 1
+        self.somme += valeur
+        self.nombre += 1
+
+
+class Mesures:
+    """
+    Compteurs et histogrammes du processus, exposés au format texte de Prometheus (/metrics).
+    Les recherches accumulent leurs compteurs localement et ne les publient qu'une fois finies :
+    rien n'est fait par noeud. Avec actif=False (CHESS_METRIQUES=0) tout est ignoré.
+    """
+    PREFIXE = "iachess_"
+
+    def __init__(self, actif=True):
+        self.actif = actif
+        self.verrou = threading.Lock()
+        self.compteurs = {}
+        self.histogrammes = {}
+
+    @staticmethod
+    def _cle(nom, etiquettes):
+        return nom, tuple(sorted(etiquettes.items()))
+
+    def incrementer(self, nom, n=1, **etiquettes):
+        if not self.actif:
+            return
+        cle = self._cle(nom, etiquettes)
+        with self.verrou:
+            self.compteurs[cle] = self.compteurs.get(cle, 0) + n
+
+    def observer(self, nom, valeur, **etiquettes):
+        if not self.actif:
+            return
+        cle = self._cle(nom, etiquettes)
+        with self.verrou:
+            histogramme = self.histogrammes.get(cle)
+            if histogramme is None:
+                histogramme = self.histogrammes[cle] = Histogramme()
+            histogramme.observer(valeur)
+
+    @contextlib.contextmanager
+    def chronometre(self, nom, **etiquettes):
+        """Observe la durée du bloc dans l'histogramme nom"""
+        debut = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observer(nom, time.perf_counter() - debut, **etiquettes)
+
+    @staticmethod
+    def _etiquettes(etiquettes, supplement=()):
+        etiquettes = tuple(etiquettes) + tuple(supplement)
+        if not etiquettes:
+            return ""
+        return "{" + ",".join(f'{cle}="{valeur}"' for cle, valeur in etiquettes) + "}"
+
+    def texte(self):
+        with self.verrou:
+            compteurs = sorted(self.compteurs.items())
+            histogrammes = sorted((cle, (list(h.comptes), h.somme, h.nombre, h.bornes))
+                                  for cle, h in self.histogrammes.items())
+        lignes = []
+        types = set()
+        for (nom, etiquettes), valeur in compteurs:
+            nom = self.PREFIXE + nom + "_total"
+            if nom not in types:
+                types.add(nom)
+                lignes.append(f"# TYPE {nom} counter")
+            lignes.append(f"{nom}{self._etiquettes(etiquettes)} {valeur}")
+        for (nom, etiquettes), (comptes, somme, nombre, bornes) in histogrammes:
+            nom = self.PREFIXE + nom
+            if nom not in types:
+                types.add(nom)
+                lignes.append(f"# TYPE {nom} histogram")
+            cumul = 0
+            for borne, compte in zip(bornes + ("+Inf",), comptes):
+                cumul += compte
+                lignes.append(f"{nom}_bucket{self._etiquettes(etiquettes, (('le', borne),))} {cumul}")
+            lignes.append(f"{nom}_sum{self._etiquettes(etiquettes)} {somme}")
+            lignes.append(f"{nom}_count{self._etiquettes(etiquettes)} {nombre}")
+        return "\n".join(lignes) + "\n"
+
+    def clear(self):
+        with self.verrou:
+            self.compteurs.clear()
+            self.histogrammes.clear()
+
+
+mesures = Mesures(METRIQUES)
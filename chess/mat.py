@@ -0,0 +1,96 @@
+import chess
+from evaluation import VALEURS_MCTS
+
+
+# Profondeur (en coups du camp au trait) de la recherche de mat interne
+PROFONDEUR_MAT = 2
+# Nombre d'attaques adverses sur les cases autour du roi à partir duquel un mat est plausible
+SEUIL_ATTAQUES_ROI = 5
+# Un échec est forçant s'il ne laisse pas plus de réponses que cela à l'adversaire
+REPONSES_ECHEC_FORCANT = 2
+# Gain de matériel (prise moins preneur, en pions) d'une prise forçante : dame prise par une pièce
+# plus faible, tour prise par un pion
+GAIN_PRISE_FORCANTE = 4
+
+
+def coups_echec(board):
+    return [move for move in board.legal_moves if board.gives_check(move)]
+
+
+def _mat(board, n):
+    """Coup qui mate en n coups au plus par une suite d'échecs, ou None"""
+    for move in coups_echec(board):
+        board.push(move)
+        try:
+            if board.is_checkmate():
+                return move
+            if n > 1 and not board.is_game_over() and \
+                    all(_mat_apres(board, reponse, n - 1) for reponse in list(board.legal_moves)):
+                return move
+        finally:
+            board.pop()
+    return None
+
+
+def _mat_apres(board, reponse, n):
+    board.push(reponse)
+    try:
+        return _mat(board, n) is not None
+    finally:
+        board.pop()
+
+
+def mat_en(board, n=PROFONDEUR_MAT):
+    """
+    Recherche de mat en au plus n coups pour le camp au trait, le plus court d'abord.
+    Le camp qui mate ne joue que des échecs : c'est complet pour un mat en 1 et très rapide
+    au-delà, mais un mat précédé d'un coup tranquille n'est pas trouvé.
+    """
+    board = board.copy(stack=False)
+    for profondeur in range(1, n + 1):
+        move = _mat(board, profondeur)
+        if move is not None:
+            return move
+    return None
+
+
+def echec_forcant(board, move):
+    """Vrai si move donne un échec qui ne laisse à l'adversaire que peu de réponses"""
+    if not board.gives_check(move):
+        return False
+    board.push(move)
+    try:
+        return board.legal_moves.count() <= REPONSES_ECHEC_FORCANT
+    finally:
+        board.pop()
+
+
+def prise_forcante(board, move):
+    """Vrai si move prend une pièce bien plus forte que celle qui la prend"""
+    prise = board.piece_type_at(move.to_square)
+    return prise is not None and \
+        VALEURS_MCTS[prise] - VALEURS_MCTS[board.piece_type_at(move.from_square)] >= GAIN_PRISE_FORCANTE
+
+
+def position_critique(board):
+    """
+    Position où un mat (pour l'un ou l'autre camp) ou un gain décisif est plausible : échec,
+    échec forçant ou prise forçante possible, ou roi dont les cases voisines sont très attaquées.
+    Un simple échec possible ne suffit pas (il y en a dans la plupart des milieux de partie).
+    Sert à ne consulter le moteur qu'à bon escient.
+    """
+    if board.is_check():
+        return True
+    if any(prise_forcante(board, move) for move in board.generate_legal_captures()):
+        return True
+    if any(echec_forcant(board, move) for move in board.legal_moves):
+        return True
+    for couleur in chess.COLORS:
+        roi = board.king(couleur)
+        if roi is None:
+            continue
+        zone = chess.SquareSet(chess.BB_KING_ATTACKS[roi] | chess.BB_SQUARES[roi])
+        attaques = sum(len(board.attackers(not couleur, case)) for case in zone)
+        if attaques >= SEUIL_ATTAQUES_ROI:
+            return True
+    return False
@@ -0,0 +1,198 @@
+"""
+Matchs sans interface entre deux joueurs, parties réparties sur un pool de processus :
+    python match.py minimax:profondeur=2 aleatoire --parties 20 --pgn match.pgn
+    python match.py mcts:iterations=200 uci:commande=./moteur_stub.py,temps=0.05 --processus 4
+Joueurs : minimax (profondeur, temps), mcts (iterations), aleatoire, uci (commande, temps, profondeur).
+Les parties vont par paires sur la même ouverture (tirée du livre) en échangeant les couleurs.
+Le résultat est donné du point de vue du premier joueur : score, différence d'Elo et SPRT.
+"""
+import argparse
+import math
+import multiprocessing
+import random
+from concurrent.futures import ProcessPoolExecutor
+import chess
+import chess.engine
+import chess.pgn
+from minimax import JoueurMinimax, JoueurAleatoire
+from mcts import JoueurMCTS
+from ouvertures import livre
+
+
+# Au-delà de ce nombre de demi-coups, la partie est déclarée nulle
+MAX_DEMI_COUPS = 300
+# Nombre de demi-coups d'ouverture tirés du livre
+DEMI_COUPS_OUVERTURE = 6
+# Parties fictives ajoutées à chaque issue (victoire, nulle, défaite) pour estimer score et variance
+PRIOR_TRINOMIAL = 0.5
+# Nombre minimal de parties avant que le SPRT ne conclue
+PARTIES_MIN_SPRT = 20
+
+
+class JoueurUCI:
+    """Moteur UCI externe (Stockfish, moteur_stub.py...) lancé dans le processus de la partie"""
+    def __init__(self, board, ma_couleur, commande, temps=0.1, profondeur=None):
+        self.color = ma_couleur=="white" or ma_couleur=="blanc"
+        self.limite = chess.engine.Limit(time=temps, depth=profondeur)
+        self.moteur = chess.engine.SimpleEngine.popen_uci(commande)
+
+    def choisir(self, board):
+        return self.moteur.play(board, self.limite).move
+
+    def fermer(self):
+        self.moteur.quit()
+
+
+JOUEURS = {"minimax": JoueurMinimax, "mcts": JoueurMCTS, "aleatoire": JoueurAleatoire, "uci": JoueurUCI}
+
+
+def lire_joueur(spec):
+    """'nom:cle=valeur,cle=valeur' -> (nom, paramètres). Les valeurs numériques sont converties"""
+    nom, _, reste = spec.partition(":")
+    if nom not in JOUEURS:
+        raise ValueError(f"joueur inconnu : {nom}")
+    parametres = {}
+    for element in filter(None, reste.split(",")):
+        cle, _, valeur = element.partition("=")
+        for conversion in (int, float):
+            try:
+                valeur = conversion(valeur)
+                break
+            except ValueError:
+                pass
+        parametres[cle] = valeur
+    return nom, parametres
+
+
+def creer_joueur(spec, board, couleur):
+    nom, parametres = lire_joueur(spec)
+    return JOUEURS[nom](board, couleur, **parametres)
+
+
+def ouverture(graine):
+    """Premiers demi-coups d'une ouverture tirée au hasard dans le livre"""
+    rng = random.Random(graine)
+    board = chess.Board()
+    for _ in range(DEMI_COUPS_OUVERTURE):
+        move = livre.coup(board, rng)
+        if move is None:
+            break
+        board.push(move)
+    return board.move_stack
+
+
+def jouer_partie(blancs, noirs, coups_ouverture, graine, ronde=1):
+    """Exécuté dans un processus : joue une partie et renvoie (résultat, pgn)"""
+    random.seed(graine)
+    board = chess.Board()
+    for move in coups_ouverture:
+        board.push(move)
+    joueurs = {chess.WHITE: creer_joueur(blancs, board, "white"), chess.BLACK: creer_joueur(noirs, board, "black")}
+    try:
+        while not board.is_game_over(claim_draw=True) and len(board.move_stack) < MAX_DEMI_COUPS:
+            move = joueurs[board.turn].choisir(board.copy())
+            board.push(move)
+    finally:
+        for joueur in joueurs.values():
+            if hasattr(joueur, "fermer"):
+                joueur.fermer()
+    resultat = board.result(claim_draw=True)
+    if resultat == "*":
+        # Limite de demi-coups atteinte
+        resultat = "1/2-1/2"
+    partie = chess.pgn.Game.from_board(board)
+    partie.headers.update({"Event": "match IAchess", "Round": str(ronde), "White": blancs, "Black": noirs,
+                           "Result": resultat})
+    return resultat, str(partie)
+
+
+def jouer_match(joueur_a, joueur_b, nb_parties, nb_processus=None, graine=0):
+    """
+    Joue nb_parties entre joueur_a et joueur_b (specs de lire_joueur). Renvoie la liste
+    des (résultat du point de vue de joueur_a, pgn) dans l'ordre des parties.
+    """
+    taches = []
+    for i in range(nb_parties):
+        # Une ouverture par paire de parties, chaque joueur la jouant une fois avec les blancs
+        coups_ouverture = ouverture(graine + i // 2)
+        blancs, noirs = (joueur_a, joueur_b) if i % 2 == 0 else (joueur_b, joueur_a)
+        taches.append((blancs, noirs, coups_ouverture, graine + i, i + 1))
+    contexte = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=nb_processus, mp_context=contexte) as pool:
+        futures = [pool.submit(jouer_partie, *tache) for tache in taches]
+        parties = []
+        for i, future in enumerate(futures):
+            resultat, pgn = future.result()
+            points = {"1-0": 1.0, "0-1": 0.0}.get(resultat, 0.5)
+            parties.append((points if i % 2 == 0 else 1 - points, pgn))
+    return parties
+
+
+def statistiques(points, elo0=0.0, elo1=10.0, alpha=0.05, beta=0.05):
+    """
+    Victoires, nulles, défaites, score, différence d'Elo (avec sa marge à 95 %) et SPRT
+    (approximation du rapport de vraisemblance par la loi normale, bornes de Wald).
+    Score et variance viennent du modèle trinomial (victoire, nulle, défaite) régularisé par
+    PRIOR_TRINOMIAL partie fictive de chaque sorte : quelques victoires de suite ne donnent
+    ni une variance nulle ni un Elo infini. Pas de décision avant PARTIES_MIN_SPRT parties.
+    """
+    n = len(points)
+    victoires = points.count(1.0)
+    nulles = points.count(0.5)
+    defaites = points.count(0.0)
+    total = n + 3 * PRIOR_TRINOMIAL
+    p_victoire = (victoires + PRIOR_TRINOMIAL) / total
+    p_nulle = (nulles + PRIOR_TRINOMIAL) / total
+    score = p_victoire + p_nulle / 2
+    variance = p_victoire + p_nulle / 4 - score ** 2
+
+    def elo(s):
+        s = min(max(s, 1e-6), 1 - 1e-6)
+        return -400 * math.log10(1 / s - 1)
+
+    marge = 1.96 * math.sqrt(variance / n) if n else 0.5
+    stats = {"parties": n, "victoires": victoires, "nulles": nulles, "defaites": defaites,
+             "score": sum(points) / n if n else 0.5,
+             "elo": elo(score), "elo_min": elo(score - marge), "elo_max": elo(score + marge)}
+
+    s0 = 1 / (1 + 10 ** (-elo0 / 400))
+    s1 = 1 / (1 + 10 ** (-elo1 / 400))
+    llr = n * (s1 - s0) * (2 * score - s0 - s1) / (2 * variance)
+    borne_basse = math.log(beta / (1 - alpha))
+    borne_haute = math.log((1 - beta) / alpha)
+    if n < PARTIES_MIN_SPRT:
+        decision = "continuer"
+    elif llr >= borne_haute:
+        decision = "H1"
+    elif llr <= borne_basse:
+        decision = "H0"
+    else:
+        decision = "continuer"
+    stats.update({"llr": llr, "borne_basse": borne_basse, "borne_haute": borne_haute, "sprt": decision})
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("joueur_a")
+    parser.add_argument("joueur_b")
+    parser.add_argument("--parties", type=int, default=10)
+    parser.add_argument("--processus", type=int, default=None)
+    parser.add_argument("--graine", type=int, default=0)
+    parser.add_argument("--pgn", help="fichier où écrire les parties")
+    parser.add_argument("--elo0", type=float, default=0.0)
+    parser.add_argument("--elo1", type=float, default=10.0)
+    args = parser.parse_args()
+    for spec in (args.joueur_a, args.joueur_b):
+        lire_joueur(spec)
+
+    parties = jouer_match(args.joueur_a, args.joueur_b, args.parties, args.processus, args.graine)
+    if args.pgn:
+        with open(args.pgn, "w") as fp:
+            fp.write("\n\n".join(pgn for _, pgn in parties) + "\n")
+    stats = statistiques([points for points, _ in parties], args.elo0, args.elo1)
+    print(f"{args.joueur_a} contre {args.joueur_b} : +{stats['victoires']} ={stats['nulles']} -{stats['defaites']} "
+          f"score {stats['score']:.3f}")
+    print(f"Elo {stats['elo']:+.1f} [{stats['elo_min']:+.1f}, {stats['elo_max']:+.1f}]")
+    print(f"SPRT elo0={args.elo0} elo1={args.elo1} : LLR {stats['llr']:.2f} "
+          f"[{stats['borne_basse']:.2f}, {stats['borne_haute']:.2f}] -> {stats['sprt']}")
@@ -3,40 +3,230 @@ from math import log, inf, sqrt
 import random
 import chess
 import chess.engine
-import os
-
-#Stockfish
-engine = chess.engine.SimpleEngine.popen_uci(r"stockfish-windows-2022-x86-64-avx2.exe")
-
-
-
-# Définition de la classe Node
-class Node:
-    def __init__(self, state, parent=None):
-        # État actuel du noeud
-        self.state = state
-        # Parent du noeud
-        self.parent = parent
-        # Liste des coups possibles à partir de ce noeud
-        self.children = []
-        # Nombre de victoires du noeud
-        self.wins = 0
-        # Nombre de visites du noeud
-        self.visits = 0
-        
-    # Ajout d'un child à un noeud
-    def add_child(self, child_state):
-        child = Node(child_state, self)
-        self.children.append(child)
-        return child
-        
-    # Mise à jour du nombre de victoires et de visites du noeud
-    def update(self, reward):
-        self.visits += 1
-        self.wins += reward
-
-    
+import threading
+from collections import OrderedDict, deque
+import numpy as np
+import chess.polyglot
+from evaluation import materiel, VALEURS_MCTS, EvaluationTapered, bitboards_enfants
+from ouvertures import livre, dans_ouverture
+from rollouts import POLITIQUES
+# Stockfish : pool de processus lancés au premier usage (voir ressources.py et pool_moteurs.py)
+from ressources import registre, RessourceIndisponible
+from pool_moteurs import ERREURS_MOTEUR
+from analyses import analyses
+from instrumentation import mesures, journal
+import logging
+import time
+from mat import mat_en, position_critique
+from finales import finales
+
+# Règle de sélection des enfants : "ucb" ou "puct" (priors tirés de l'évaluation statique)
+SELECTION = "puct"
+C_PUCT = 1.5
+# Température du softmax des priors, en centipions
+TEMPERATURE_PRIORS = 100.0
+# Si vrai, l'expansion n'attend pas l'analyse du moteur : le noeud reste une feuille en attendant
+EXPANSION_ASYNCHRONE = True
+
+
+
+# Arbre de recherche
+class Arbre:
+    """
+    Arbre MCTS stocké à plat dans des tableaux parallèles : le noeud i a pour coup moves[i]
+    (le coup joué depuis son parent), parent[i], visits[i], wins[i] et priors[i] (probabilité
+    a priori du coup, utilisée par PUCT).
+    Les enfants d'un noeud sont rangés côte à côte, de premier_enfant[i] à
+    premier_enfant[i] + nb_enfants[i] - 1, donc une expansion coûte O(1) par enfant.
+    Seul le plateau de la racine est gardé : celui d'un noeud se retrouve en rejouant ses coups.
+    """
+    RACINE = 0
+
+    def __init__(self, state, capacite=1024):
+        # État de la racine
+        self.state = state.copy()
+        self.moves = [None]
+        self.parent = np.full(capacite, -1, dtype=np.int32)
+        self.premier_enfant = np.zeros(capacite, dtype=np.int32)
+        self.nb_enfants = np.zeros(capacite, dtype=np.int32)
+        # Nombre de visites et somme des récompenses de chaque noeud
+        self.visits = np.zeros(capacite, dtype=np.float64)
+        self.wins = np.zeros(capacite, dtype=np.float64)
+        self.priors = np.zeros(capacite, dtype=np.float64)
+        self.taille = 1
+
+    def __getstate__(self):
+        # Pour le mode racine, qui fait passer les arbres d'un processus à l'autre : les tableaux
+        # sont coupés à la taille utilisée et les coups codés en entiers (départ, arrivée, promotion)
+        etat = {nom: getattr(self, nom)[:self.taille].copy()
+                for nom in ("parent", "premier_enfant", "nb_enfants", "visits", "wins", "priors")}
+        etat["moves"] = np.array([0] + [move.from_square | move.to_square << 6 | (move.promotion or 0) << 12
+                                        for move in self.moves[1:]], dtype=np.int32)
+        etat["state"] = self.state
+        etat["taille"] = self.taille
+        return etat
+
+    def __setstate__(self, etat):
+        codes = etat.pop("moves")
+        self.__dict__.update(etat)
+        self.moves = [None] + [chess.Move(int(code) & 63, int(code) >> 6 & 63, int(code) >> 12 or None)
+                               for code in codes[1:]]
+
+    def _agrandir(self, taille):
+        capacite = len(self.parent)
+        if taille <= capacite:
+            return
+        while capacite < taille:
+            capacite *= 2
+        for nom in ("parent", "premier_enfant", "nb_enfants", "visits", "wins", "priors"):
+            ancien = getattr(self, nom)
+            nouveau = np.zeros(capacite, dtype=ancien.dtype)
+            nouveau[:len(ancien)] = ancien
+            setattr(self, nom, nouveau)
+
+    # Ajout d'un bloc d'enfants à un noeud qui n'en a pas encore (priors uniformes par défaut)
+    def ajouter_enfants(self, noeud, moves, priors=None):
+        moves = list(moves)
+        debut = self.taille
+        fin = debut + len(moves)
+        self._agrandir(fin)
+        self.moves.extend(moves)
+        self.parent[debut:fin] = noeud
+        self.priors[debut:fin] = 1 / max(1, len(moves)) if priors is None else priors
+        self.premier_enfant[noeud] = debut
+        self.nb_enfants[noeud] = len(moves)
+        self.taille = fin
+        return range(debut, fin)
+
+    def enfants(self, noeud):
+        debut = int(self.premier_enfant[noeud])
+        return range(debut, debut + int(self.nb_enfants[noeud]))
 
+    # Mise à jour du nombre de victoires et de visites du noeud
+    def update(self, noeud, reward):
+        self.visits[noeud] += 1
+        self.wins[noeud] += reward
+
+    def perte_virtuelle(self, noeud, n=1):
+        """
+        Compte une défaite provisoire sur le chemin du noeud (n=-1 pour l'annuler) : pendant une
+        simulation en cours, les sélections suivantes sont poussées vers d'autres branches.
+        La défaite est celle du camp qui choisit le noeud : l'IA (au trait à la racine) aux
+        profondeurs impaires, l'adversaire aux profondeurs paires.
+        """
+        chemin = []
+        while noeud != -1:
+            chemin.append(noeud)
+            noeud = int(self.parent[noeud])
+        for profondeur, noeud in enumerate(reversed(chemin)):
+            self.visits[noeud] += n
+            self.wins[noeud] += n if profondeur and profondeur % 2 == 0 else -n
+
+    def coups(self, noeud):
+        """Coups joués de la racine jusqu'au noeud"""
+        coups = []
+        while noeud != self.RACINE:
+            coups.append(self.moves[noeud])
+            noeud = int(self.parent[noeud])
+        coups.reverse()
+        return coups
+
+    def plateau(self, noeud):
+        board = self.state.copy()
+        for move in self.coups(noeud):
+            board.push(move)
+        return board
+
+    def meilleur_coup(self):
+        """Coup le plus visité de la racine (pendant la recherche, le meilleur jusqu'ici)"""
+        enfants = self.enfants(self.RACINE)
+        if not enfants:
+            return None
+        return self.moves[enfants.start + int(np.argmax(self.visits[enfants.start:enfants.stop]))]
+
+    def progression(self):
+        """Etat de la recherche en cours : visites de chaque coup de la racine"""
+        enfants = self.enfants(self.RACINE)
+        coup = self.meilleur_coup()
+        return {
+            'meilleur_coup': None if coup is None else str(coup),
+            'iterations': int(self.visits[self.RACINE]),
+            'visites': {str(self.moves[child]): int(self.visits[child]) for child in enfants},
+        }
+
+    def sous_arbre(self, noeud):
+        """Nouvel arbre dont la racine est noeud, avec ses descendants et leurs statistiques"""
+        nouveau = Arbre(self.plateau(noeud))
+        nouveau.visits[0] = self.visits[noeud]
+        nouveau.wins[0] = self.wins[noeud]
+        # Parcours en largeur : les enfants restent contigus dans le nouvel arbre
+        file = deque([(noeud, Arbre.RACINE)])
+        while file:
+            ancien, copie = file.popleft()
+            enfants = self.enfants(ancien)
+            if not enfants:
+                continue
+            copies = nouveau.ajouter_enfants(copie, [self.moves[child] for child in enfants],
+                                             self.priors[enfants.start:enfants.stop])
+            nouveau.visits[copies.start:copies.stop] = self.visits[enfants.start:enfants.stop]
+            nouveau.wins[copies.start:copies.stop] = self.wins[enfants.start:enfants.stop]
+            file.extend(zip(enfants, copies))
+        return nouveau
+
+
+# Nombre de positions gardées dans le cache des arbres
+TAILLE_CACHE_ARBRES = 256
+
+
+class CacheArbres:
+    """
+    Garde les arbres des recherches précédentes pour repartir de leurs visites au coup suivant.
+    Après une recherche, chaque réponse de l'adversaire présente dans l'arbre (sous le coup joué)
+    est indexée par le hash Zobrist de la position obtenue. Si la requête suivante arrive sur
+    une de ces positions, la recherche reprend le sous-arbre correspondant.
+    Les entrées les moins récemment utilisées sont supprimées au-delà de `taille` positions.
+    """
+    def __init__(self, taille=TAILLE_CACHE_ARBRES):
+        self.taille = taille
+        self.entrees = OrderedDict()
+        self.verrou = threading.Lock()
+
+    def cle(self, board, player, partie):
+        return (partie, player, chess.polyglot.zobrist_hash(board))
+
+    def reprendre(self, board, player, partie=None):
+        """Arbre enraciné sur board si une recherche précédente l'a déjà exploré, sinon None"""
+        cle = self.cle(board, player, partie)
+        with self.verrou:
+            entree = self.entrees.pop(cle, None)
+        if entree is None:
+            return None
+        arbre, noeud = entree
+        return arbre.sous_arbre(noeud)
+
+    def memoriser(self, arbre, best_move, player, partie=None):
+        """Indexe les positions atteignables après best_move et une réponse de l'adversaire"""
+        best_move = chess.Move.from_uci(str(best_move))
+        coup_joue = None
+        for child in arbre.enfants(Arbre.RACINE):
+            if arbre.moves[child] == best_move:
+                coup_joue = child
+        if coup_joue is None:
+            return
+        board = arbre.state.copy()
+        board.push(best_move)
+        with self.verrou:
+            for reponse in arbre.enfants(coup_joue):
+                board.push(arbre.moves[reponse])
+                cle = self.cle(board, player, partie)
+                board.pop()
+                self.entrees[cle] = (arbre, reponse)
+                self.entrees.move_to_end(cle)
+            while len(self.entrees) > self.taille:
+                self.entrees.popitem(last=False)
+
+
+cache_arbres = CacheArbres()
 
 
 def random_board(max_depth=100) :
@@ -53,50 +243,54 @@ def random_board(max_depth=100) :
     return board
 
 
-# Calcul de la valeur UCB
-def ucb(node, c_param=sqrt(2)):
-    if node.visits==0:
-        return inf
-    return node.wins / (node.visits) + c_param * sqrt(log(node.parent.visits) / node.visits)
-    
+# Calcul des valeurs UCB de tous les enfants d'un noeud d'un coup, sur les tranches des tableaux de l'arbre
+# (le logarithme des visites du parent n'est calculé qu'une fois)
+# signe : -1 quand l'adversaire choisit (les récompenses sont du point de vue de l'IA)
+def ucb(arbre, noeud, c_param=sqrt(2), signe=1):
+    enfants = arbre.enfants(noeud)
+    visits = arbre.visits[enfants.start:enfants.stop]
+    wins = signe * arbre.wins[enfants.start:enfants.stop]
+    log_parent = log(max(arbre.visits[noeud], 1))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scores = wins / visits + c_param * np.sqrt(log_parent / visits)
+    # Un enfant jamais visité passe en premier
+    scores[visits <= 0] = inf
+    return scores
+
+
+#Calcul des valeurs PUCT : Q + c * P * sqrt(N parent) / (1 + n), P étant le prior du coup
+def puct(arbre, noeud, c_param=C_PUCT, signe=1):
+    enfants = arbre.enfants(noeud)
+    visits = arbre.visits[enfants.start:enfants.stop]
+    wins = signe * arbre.wins[enfants.start:enfants.stop]
+    priors = arbre.priors[enfants.start:enfants.stop]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        exploitation = np.where(visits > 0, wins / visits, 0.0)
+    exploration = c_param * priors * sqrt(max(arbre.visits[noeud], 1)) / (1 + np.maximum(visits, 0))
+    return exploitation + exploration
+
+
+# Évaluateur des priors : les coups sont classés par l'évaluation statique de la position obtenue
+evaluateur_priors = EvaluationTapered()
+
+
+def priors_coups(state, moves):
+    """Probabilités a priori des coups : softmax des évaluations (en centipions) pour le camp au trait"""
+    signe = 1 if state.turn == chess.WHITE else -1
+    # Toutes les positions filles sont évaluées d'un coup (voir evaluation.evaluer_batch)
+    scores = signe * evaluateur_priors.evaluer_batch(bitboards_enfants(state, moves))
+    scores = np.exp((scores - scores.max()) / TEMPERATURE_PRIORS)
+    return scores / scores.sum()
+
+
+def developper(arbre, noeud, state):
+    """Ajoute tous les coups légaux de state comme enfants du noeud, avec leurs priors"""
+    moves = list(state.legal_moves)
+    return arbre.ajouter_enfants(noeud, moves, priors_coups(state, moves) if moves else None)
+
 
-#Calcul de la valeur PUCT   
-def puct(node, c_param):
-    total_visits = sum(child.visits for child in node.children)
-    # Calcul du logarithme naturel du nombre total de visites
-    if total_visits == 0:
-        log_total_visits = 0
-    else :
-        log_total_visits = log(total_visits)
-        
-    best_score = -inf
-    best_child = None
-
-    for child in node.children:
-        if child.visits == 0:
-            # Si l'child n'a pas encore été visité
-            exploitation_term = inf
-            exploration_term = inf
-        else: 
-            # Calcul du terme d'exploitation et du terme d'exploration
-            exploitation_term = child.wins / child.visits
-            exploration_term = c_param * sqrt(log_total_visits / child.visits) * (1 / len(node.children))
-        
-        # Calcul du score pour chaque child
-        score = exploitation_term + exploration_term
-        
-        # Mise à jour du meilleur score et de l'child correspondant
-        if score > best_score:
-            best_score = score
-            best_child = child
-    # Retourne l'child ayant le meilleur score
-    return best_child
-    
-    
-    
 # Évaluation de l'état de jeu
 def evaluate(state, player):
-    piece_values = {'P': 1,'N': 3,'B': 3,'R': 5,'Q': 9,'K': 100,'p': 1,'n': 3,'b': 3,'r': 5,'q': 9,'k': 100}
     if state.is_checkmate():
         if " "+player+" " in str(state.fen()):
             return 1
@@ -111,145 +305,212 @@ def evaluate(state, player):
     elif state.is_fivefold_repetition():
         return 0
     else:
-        score = 0
-        # Calcul du score en sommant les valeurs de chaque pièce
-        for piece in state.piece_map().values():
-            if piece.color == chess.WHITE:
-                score += piece_values[str(piece)]
-            else:
-                score -= piece_values[str(piece)]
-
-        # Si c'est au tour du joueur courant, retourne l'inverse du score divisé par 100
-        if state.turn == player:
+        # Différence de matériel calculée sur les bitboards
+        score = materiel(state, VALEURS_MCTS)
+
+        # Score du point de vue de l'IA, qui joue la couleur opposée au joueur, divisé par 100
+        if player == "w":
             return -score / 100.0
-        # Sinon, retourne le score divisé par 100
         else:
             return score / 100.0
 
 
-# Sélection d'un noeud fils avec la plus grande valeur UCB ou PUCT
-def select_node(node,state, player):
-    
-    max_score = -inf
-    best_child = None
-    for child in node.children:
-        score = ucb(child)
-        if score > max_score:
-            max_score = score
-            best_child = child
-    return best_child
+# Sélection d'un noeud fils avec la plus grande valeur UCB ou PUCT, du point de vue du camp au trait
+def select_node(arbre, noeud, state, player):
+    signe = -1 if state.turn == (player == "w") else 1
+    if SELECTION == "puct":
+        scores = puct(arbre, noeud, signe=signe)
+    else:
+        scores = ucb(arbre, noeud, signe=signe)
+    return int(arbre.premier_enfant[noeud]) + int(np.argmax(scores))
+
+
+def coup_adversaire(state):
+    """
+    Coup de l'adversaire d'après l'analyse du moteur (une seule par position, voir analyses.py).
+    False si l'analyse est encore en cours, None si aucun moteur ne répond.
+    """
+    try:
+        if EXPANSION_ASYNCHRONE:
+            infos = analyses.demander(state)
+        else:
+            infos = analyses.analyser(state)
+    except (RessourceIndisponible,) + ERREURS_MOTEUR:
+        infos = []
+    if infos is None:
+        return False
+    if infos and infos[0]["pv"]:
+        return chess.Move.from_uci(infos[0]["pv"][0])
+    return None
 
-    #return puct(node, 5.0)
 
 # Expansion d'un noeud avec un mouvement aléatoire si c'est l'algo et le meilleur coup si c'est le joueur
-def expand_node(node, state, player):
-    if " "+player+" " in state.fen():
-        e = 0
-        try:
-            best_possible_move = engine.play(state, chess.engine.Limit(time=0.1,depth = 18))
-        except:
-            best_possible_move = random.choice(list(state.legal_moves))
-            e = 1
-        new_state = state.copy()
-        if e==1:
-            new_state.push(best_possible_move)
-            e = 0
+# Sans moteur, toutes les réponses du joueur sont développées : la sélection choisit ensuite la
+# meilleure pour lui, au lieu d'une seule réponse tirée au hasard qui laisserait passer les gaffes
+# Le coup de l'enfant choisi est joué sur state, la simulation part donc de l'enfant
+# Si le coup du joueur n'est pas encore connu, le noeud n'est pas développé et la simulation part de lui
+# rng : générateur aléatoire (le module random par défaut)
+def expand_node(arbre, noeud, state, player, rng=random):
+    if state.turn == (player == "w"):
+        best_possible_move = coup_adversaire(state)
+        if best_possible_move is False:
+            return noeud
+        if best_possible_move is None:
+            chosen_move = rng.choice(developper(arbre, noeud, state))
         else:
-            new_state.push(best_possible_move.move)
-        if new_state not in [child.state for child in node.children]:
-                node.add_child(new_state)
-        chosen_move = node.children[0]
-        return chosen_move
+            chosen_move = arbre.ajouter_enfants(noeud, [best_possible_move])[0]
     else:
-        for move in state.legal_moves:
-            new_state = state.copy()
-            new_state.push(move)
-            if new_state not in [child.state for child in node.children]:
-                node.add_child(new_state)
-        random_move = random.choice(node.children)
-        return random_move
-
-# Simulation d'un jeu jusqu'à la fin
-def simulate(state, player): 
-    while not state.is_game_over():
-        state.push(random.choice(list(state.legal_moves))) # Avec des mouvements aléatoires
-        """best_possible_move = engine.play(state, chess.engine.Limit(time=0.1,depth = 18))
-        if state.is_game_over():
-                return evaluate(state)
-        else:
-            state.push(best_possible_move.move)"""
-    return evaluate(state, player)
+        chosen_move = rng.choice(developper(arbre, noeud, state))
+    state.push(arbre.moves[chosen_move])
+    return chosen_move
+
+# Simulation d'un jeu (voir rollouts.py)
+# La politique de simulation est choisie dans rollouts.POLITIQUES
+politique_rollout = POLITIQUES["captures"]
+
+# depart : matériel à la racine, référence du seuil de la politique
+def simulate(state, player, depart=None):
+    return politique_rollout.simuler(state, player, evaluate, depart)
 
 
 #Mise à jour de la valeur de tous les Noeuds
-def backpropagate(node, reward, player):
-    while node is not None:
-        node.update(reward)
-        node = node.parent
+def backpropagate(arbre, noeud, reward, player):
+    while noeud != -1:
+        arbre.update(noeud, reward)
+        noeud = int(arbre.parent[noeud])
         
 
 
+# Les analyses sont mises en cache par position (voir analyses.py), format_info y est appliqué
 def analyze_position(board, num_moves_to_return=1, depth_limit=10, time_limit=0.1):
     search_limit = chess.engine.Limit(depth=depth_limit, time=time_limit)
-    infos = engine.analyse(board, search_limit, multipv=num_moves_to_return)
-    return [format_info(info) for info in infos]
-
-def format_info(info):
-    score = info["score"].white()
-    mate_score = score.mate()
-    centipawn_score = score.score()
-    return {
-        "mate_score": mate_score,
-        "centipawn_score": centipawn_score,
-        "pv": format_moves(info["pv"]),
-    }
-    
-def format_moves(pv):
-    return [move.uci() for move in pv]
+    return analyses.analyser(board, num_moves_to_return, search_limit)
+
+
+
+
+
+def coup_immediat(state):
+    """Coup du livre d'ouvertures, des tables de finales ou mat trouvé à l'avance : pas besoin de chercher"""
+    with mesures.chronometre("mcts_verification_secondes"):
+        coup, source = _coup_immediat(state)
+    if coup is not None:
+        nom = {"livre": "livre_coups", "tables": "finales_coups"}.get(source, "mats_trouves")
+        mesures.incrementer(nom, algo="mcts", source=source)
+        journal.debug("mcts : coup immédiat %s (%s)", coup, source)
+    return coup
+
+
+def _coup_immediat(state):
+    #On vérifie si on est dans une ouverture
+    if dans_ouverture(state.ply()):
+        coup_livre = livre.coup(state)
+        if coup_livre is not None:
+            return coup_livre, "livre"
+    # Coup parfait d'après les tables de finales
+    coup_table = finales.meilleur_coup(state)[0]
+    if coup_table is not None:
+        return coup_table, "tables"
+    # Mat court trouvé sans le moteur
+    coup_mat = mat_en(state)
+    if coup_mat is not None:
+        return coup_mat, "interne"
+    # Le moteur n'est consulté que si un mat est plausible
+    if not position_critique(state):
+        return None, None
+    try:
+        distance_checkmate = analyze_position(state)
+    except (RessourceIndisponible,) + ERREURS_MOTEUR:
+        # Pas de moteur externe disponible : pas de recherche de mat préalable
+        distance_checkmate = []
+    if distance_checkmate and distance_checkmate[0]["mate_score"]!=None and distance_checkmate[0]["pv"]:
+        return chess.Move.from_uci(distance_checkmate[0]["pv"][0]), "moteur"
+    return None, None
+
+
+def descendre(arbre, state, player, rng=random):
+    """Sélection puis expansion : renvoie le noeud à simuler et son plateau"""
+    node = Arbre.RACINE
+    current_state = state.copy()
+    while arbre.nb_enfants[node]:
+        node = select_node(arbre, node, current_state, player)
+        current_state.push(arbre.moves[node])
+    # Une position des tables de finales reste une feuille : simulate la note directement
+    if not current_state.is_game_over() and finales.wdl(current_state) is None:
+        node = expand_node(arbre, node, current_state, player, rng)
+    return node, current_state
+
+
+def iterer(arbre, state, itermax, player, arret=None):
+    """
+    Les itermax itérations de MCTS sur l'arbre (sélection, expansion, simulation, rétropropagation).
+    S'arrête plus tôt si l'événement arret est levé
+    """
+    if arbre.nb_enfants[Arbre.RACINE] == 0:
+        developper(arbre, Arbre.RACINE, state)
+    depart = materiel(state, VALEURS_MCTS)
+    # Temps passé dans chaque phase, publié à la fin
+    selection = simulation = retropropagation = 0.0
+    faites = 0
+    for i in range(itermax):
+        if arret is not None and arret.is_set():
+            break
+        t0 = time.perf_counter()
+        node, current_state = descendre(arbre, state, player)
+        t1 = time.perf_counter()
+        # Une partie terminée est évaluée directement par simulate
+        reward = simulate(current_state, player, depart)
+        t2 = time.perf_counter()
+        backpropagate(arbre, node, reward, player)
+        retropropagation += time.perf_counter() - t2
+        simulation += t2 - t1
+        selection += t1 - t0
+        faites += 1
+    mesures.incrementer("mcts_rollouts", faites)
+    mesures.incrementer("mcts_phase_secondes", selection, phase="selection")
+    mesures.incrementer("mcts_phase_secondes", simulation, phase="simulation")
+    mesures.incrementer("mcts_phase_secondes", retropropagation, phase="retropropagation")
+
+
+def statistiques_racine(arbre):
+    """(victoires, visites) de chaque coup de la racine"""
+    moves = {}
+    for child in arbre.enfants(Arbre.RACINE):
+        moves[str(arbre.moves[child])] = (float(arbre.wins[child]), int(arbre.visits[child]))
+    return moves
 
 
+def choisir_coup(moves):
+    """Coup le plus visité d'après les statistiques de la racine"""
+    if journal.isEnabledFor(logging.DEBUG):
+        best_moves = dict(sorted(moves.items(), key=lambda item:item[1],reverse=True))
+        for (cle, valeur) in enumerate(best_moves.items()):
+            journal.debug(f"{cle}: {valeur}")
+    return chess.Move.from_uci(max(moves, key=lambda move: moves[move][1]))
 
 
+def mcts(arbre, state, itermax, player, arret=None):
+    """Monte Carlo Tree Search algorithme, arbre est un Arbre dont la racine est state"""
+    coup = coup_immediat(state)
+    if coup is not None:
+        return coup
+    with mesures.chronometre("mcts_recherche_secondes", mode="sequentiel"):
+        iterer(arbre, state, itermax, player, arret)
+    finales.publier()
+    return choisir_coup(statistiques_racine(arbre))
 
-def mcts(root, state, itermax, player):
-    """Monte Carlo Tree Search algorithme"""
-    print("loading...")
-    distance_checkmate = analyze_position(state)
-    if distance_checkmate[0]["mate_score"]!=None:
-        return distance_checkmate[0]["pv"][0]
-    first_expansion = True
-    for i in range(itermax):
-        node = root
-        current_state = state.copy()
-        if first_expansion:
-            for move in state.legal_moves:
-                new_state = state.copy()
-                new_state.push(move)
-                if new_state not in [child.state for child in node.children]:
-                    node.add_child(new_state)
-            first_expansion = False
-        while node.children:
-            #print("1", "\n", node.state)
-            node = select_node(node,current_state, player)
-            current_state.push(node.state.peek())
-
-        if not current_state.is_game_over():
-            #print("2", "\n", node.state)
-            node = expand_node(node, current_state, player)
-            reward = simulate(current_state, player)
-            backpropagate(node, reward, player)
-        else:
-            reward = evaluate(current_state, player)
-            backpropagate(node, reward, player)
-    moves = {}
-    for move in root.children:
-        moves[str(move.state.peek())] = (move.wins,move.visits)
-    best_moves = dict(sorted(moves.items(), key=lambda item:item[1],reverse=True))
-    for (cle, valeur) in enumerate(best_moves.items()):
-        print(f"{cle}: {valeur}")
 
-    #return select_node(root, board).state.peek()
-    return max(root.children, key=lambda x: x.visits).state.peek()
+class JoueurMCTS:
+    """Joueur MCTS à nombre d'itérations fixe, pour les matchs (voir match.py)"""
+    def __init__(self, board, ma_couleur, iterations=800):
+        self.board = board
+        self.color = ma_couleur=="white" or ma_couleur=="blanc"
+        self.iterations = iterations
+
+    def choisir(self, board):
+        # player est le camp adverse
+        player = "b" if board.turn == chess.WHITE else "w"
+        return mcts(Arbre(board), board, self.iterations, player)
 
 
 """
@@ -257,38 +518,35 @@ if __name__ == "__main__":
     fen ="r2q2nr/pppk3p/5ppB/2P5/2BN4/2N4P/PPP1QP1P/R3K2R w KQ - 4 14"
     board = chess.Board(fen)
     #board = random_board()
-    root = Node(board)
-    best_move = mcts(root, board, 1000)
+    arbre = Arbre(board)
+    best_move = mcts(arbre, board, 1000)
     #print(board.fen())
     print(best_move)
     print(board)
 """
 
 
-import matplotlib.pyplot as plt
-
-
-fig, ax = plt.subplots(figsize=(20, 10), dpi = 25)
-ax.set_xlim(0, 15)
-ax.set_ylim(0, 20)
-
-def plot_node(node, x, y, dx, dy):
+def plot_node(arbre, noeud, x, y, dx, dy):
+    # La figure matplotlib n'est créée qu'au premier dessin
+    ax = registre.get("axes")
     # Plot the node
-    ax.annotate(node.state, xy=(x, y), xytext=(x, y+0.5), ha='center', va='center', bbox=dict(boxstyle='square', facecolor='w', edgecolor='black'))
+    label = arbre.state.fen() if noeud == Arbre.RACINE else str(arbre.moves[noeud])
+    ax.annotate(label, xy=(x, y), xytext=(x, y+0.5), ha='center', va='center', bbox=dict(boxstyle='square', facecolor='w', edgecolor='black'))
 
     # Plot the edges to the children
-    if node.children:
-        if len(node.children) == 1:
+    enfants = arbre.enfants(noeud)
+    if enfants:
+        if len(enfants) == 1:
             x_spacing = 0
         else:
-            x_spacing = dx / (len(node.children) - 1)
+            x_spacing = dx / (len(enfants) - 1)
         x_start = x - dx / 2
         y_start = y - dy
-        for i, child in enumerate(node.children):
+        for i, child in enumerate(enfants):
             x_child = x_start + i * x_spacing
             y_child = y_start
             ax.plot([x, x_child], [y, y_child], 'k-', lw=1)
-            plot_node(child, x_child, y_child, dx/2, dy)
+            plot_node(arbre, child, x_child, y_child, dx/2, dy)
 
 
 
@@ -301,7 +559,7 @@ def move_player():
     try :
         player_move = str(input("Move: "))
         if player_move == "s":
-            best_possible_move = engine.play(board, chess.engine.Limit(time=2,depth = 18))
+            best_possible_move = registre.get("engines").play(board, chess.engine.Limit(time=2,depth = 18))
             board.push(best_possible_move.move)
         else:
             board.push_san(player_move)
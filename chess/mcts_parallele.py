@@ -0,0 +1,156 @@
+import random
+import time
+from finales import finales
+from mcts import Arbre, coup_immediat, iterer, descendre, developper, simulate, backpropagate, statistiques_racine, choisir_coup
+from ressources import registre, MCTS_PROCESSUS
+from evaluation import materiel, VALEURS_MCTS
+from instrumentation import mesures
+
+
+# Modes de recherche MCTS
+SEQUENTIEL = "sequentiel"
+RACINE = "racine"      # un arbre indépendant par processus, visites de la racine additionnées
+FEUILLES = "feuilles"  # un seul arbre, plusieurs simulations en parallèle avec perte virtuelle
+MODES = (SEQUENTIEL, RACINE, FEUILLES)
+# Nombre de simulations envoyées ensemble à un processus en mode feuilles
+SIMULATIONS_PAR_TACHE = 8
+# Nombre d'itérations d'un lot en mode racine : entre deux lots on regarde l'arrêt et on publie les visites
+ITERATIONS_PAR_LOT = 200
+
+
+def _recherche_racine(arbre, state, itermax, player, graine):
+    """
+    Exécuté dans un processus : itermax itérations de plus sur l'arbre (créé s'il est None).
+    Renvoie l'arbre et les sondages des tables de finales, publiés par le processus serveur
+    """
+    if graine is not None:
+        random.seed(graine)
+    if arbre is None:
+        arbre = Arbre(state)
+    iterer(arbre, state, itermax, player)
+    return arbre, finales.relever()
+
+
+def _simulations(etats, player, graine, depart=None):
+    """Exécuté dans un processus : un lot de simulations, renvoie leurs récompenses dans l'ordre et les sondages des tables"""
+    if graine is not None:
+        random.seed(graine)
+    recompenses = [simulate(state, player, depart) for state in etats]
+    return recompenses, finales.relever()
+
+
+def fusionner(statistiques):
+    """Additionne les (victoires, visites) de chaque coup sur plusieurs arbres"""
+    moves = {}
+    for stats in statistiques:
+        for move, (wins, visits) in stats.items():
+            total_wins, total_visits = moves.get(move, (0.0, 0))
+            moves[move] = (total_wins + wins, total_visits + visits)
+    return moves
+
+
+class SuiviRacine:
+    """Suivi d'une recherche en mode racine : statistiques additionnées après chaque lot"""
+    def __init__(self):
+        self.statistiques = {}
+
+    def meilleur_coup(self):
+        statistiques = self.statistiques
+        if not statistiques:
+            return None
+        return choisir_coup(statistiques)
+
+    def progression(self):
+        statistiques = self.statistiques
+        coup = self.meilleur_coup()
+        return {
+            'meilleur_coup': None if coup is None else str(coup),
+            'iterations': sum(visites for _, visites in statistiques.values()),
+            'visites': {move: visites for move, (_, visites) in statistiques.items()},
+        }
+
+
+def mcts_racine(state, itermax, player, nb_processus=MCTS_PROCESSUS, graine=None):
+    """
+    Parallélisation à la racine : nb_processus arbres indépendants de itermax itérations chacun,
+    le coup choisi est le plus visité en additionnant les visites des racines.
+    Avec une graine, chaque processus i utilise la graine graine + i.
+    """
+    coup = coup_immediat(state)
+    if coup is not None:
+        return coup
+    return choisir_coup(recherche_racine(state, itermax, player, nb_processus, graine))
+
+
+def recherche_racine(state, itermax, player, nb_processus=MCTS_PROCESSUS, graine=None, arret=None, suivi=None):
+    """
+    Les nb_processus arbres de mcts_racine, sans coup immédiat : (victoires, visites) additionnées par coup.
+    Les arbres grandissent par lots de ITERATIONS_PAR_LOT et reviennent ici entre deux lots : on s'arrête
+    si l'événement arret est levé, et suivi (un SuiviRacine) reçoit les statistiques additionnées.
+    """
+    pool = registre.get("processus")
+    arbres = [None] * nb_processus
+    statistiques = {str(move): (0.0, 0) for move in state.legal_moves}
+    faites = lot = 0
+    with mesures.chronometre("mcts_recherche_secondes", mode=RACINE):
+        while faites < itermax and not (arret is not None and arret.is_set()):
+            n = min(ITERATIONS_PAR_LOT, itermax - faites)
+            futures = [pool.submit(_recherche_racine, arbre, state, n, player,
+                                   None if graine is None else graine + lot * nb_processus + i)
+                       for i, arbre in enumerate(arbres)]
+            arbres = []
+            for future in futures:
+                arbre, sondages = future.result()
+                arbres.append(arbre)
+                finales.ajouter(sondages)
+            statistiques = fusionner(statistiques_racine(arbre) for arbre in arbres)
+            if suivi is not None:
+                suivi.statistiques = statistiques
+            faites += n
+            lot += 1
+    mesures.incrementer("mcts_rollouts", faites * nb_processus)
+    finales.publier()
+    return statistiques
+
+
+def mcts_feuilles(arbre, state, itermax, player, nb_processus=MCTS_PROCESSUS, graine=None, arret=None):
+    """
+    Parallélisation aux feuilles : on sélectionne jusqu'à nb_processus * SIMULATIONS_PAR_TACHE
+    feuilles à la suite, chacune marquée d'une perte virtuelle pour écarter les sélections suivantes
+    du même chemin, puis leurs simulations tournent par lots de SIMULATIONS_PAR_TACHE dans le pool
+    de processus (une tâche par simulation coûterait plus en échanges qu'elle ne rapporte).
+    La sélection et l'expansion restent dans ce processus, l'arbre n'est jamais partagé.
+    La graine ne sert qu'à un générateur local : le générateur global du serveur n'est pas touché.
+    """
+    coup = coup_immediat(state)
+    if coup is not None:
+        return coup
+    debut = time.perf_counter()
+    rng = random.Random(graine)
+    pool = registre.get("processus")
+    if arbre.nb_enfants[Arbre.RACINE] == 0:
+        developper(arbre, Arbre.RACINE, state)
+    depart = materiel(state, VALEURS_MCTS)
+    faites = 0
+    while faites < itermax and not (arret is not None and arret.is_set()):
+        feuilles = []
+        for _ in range(min(nb_processus * SIMULATIONS_PAR_TACHE, itermax - faites)):
+            node, current_state = descendre(arbre, state, player, rng)
+            arbre.perte_virtuelle(node)
+            feuilles.append((node, current_state))
+        taches = []
+        for i in range(0, len(feuilles), SIMULATIONS_PAR_TACHE):
+            lot = feuilles[i:i + SIMULATIONS_PAR_TACHE]
+            graine_lot = None if graine is None else graine + faites + i + 1
+            taches.append((lot, pool.submit(_simulations, [etat for _, etat in lot], player, graine_lot, depart)))
+        for lot, future in taches:
+            recompenses, sondages = future.result()
+            finales.ajouter(sondages)
+            for (node, _), reward in zip(lot, recompenses):
+                arbre.perte_virtuelle(node, -1)
+                backpropagate(arbre, node, reward, player)
+        faites += len(feuilles)
+    mesures.incrementer("mcts_rollouts", faites)
+    mesures.observer("mcts_recherche_secondes", time.perf_counter() - debut, mode=FEUILLES)
+    finales.publier()
+    return choisir_coup(statistiques_racine(arbre))
@@ -2,33 +2,29 @@ import chess
 import chess.engine
 from math import inf
 import random
-from random import randrange
-import pickle
+import time
+from ouvertures import livre, dans_ouverture
+from evaluation import EvaluationTapered
+from transposition import TranspositionTable, cle_transposition, inverser_borne, EXACT, LOWERBOUND, UPPERBOUND
+from instrumentation import mesures, journal
+from finales import finales
 
 
-transposition_table = {}
 MAX_TRANSPOSITION_TABLE_SIZE = 1000000
+transposition_table = TranspositionTable(MAX_TRANSPOSITION_TABLE_SIZE)
+
+# Profondeur par défaut et profondeur maximale de l'approfondissement itératif
+PROFONDEUR_DEFAUT = 3
+PROFONDEUR_MAX = 32
+# Score d'un mat : SCORE_MAT * (4 + profondeur restante), toujours supérieur au matériel
+SCORE_MAT = 900
+# Score d'une position gagnée d'après les tables de finales : SCORE_FINALE + profondeur restante,
+# au-dessus du matériel et en dessous des mats
+SCORE_FINALE = 2000
+# Fonction d'évaluation (voir evaluation.py), ramenée à l'échelle de minimax (pion = 10)
+evaluateur = EvaluationTapered(echelle=0.1)
 
 
-def evaluation_piece(piece, maximizing_player):
-    try:
-        int(piece)
-        return 0
-    except:
-        var = -1
-        if (piece == piece.lower() and not maximizing_player) or (piece==piece.capitalize() and maximizing_player):
-            var = 1
-        piece = piece.lower()
-        if piece =='p':
-            return 10*var #pion
-        elif piece =='n' or piece=='b':
-            return 30*var #cavalier ou fou
-        elif piece =='r':
-            return 50*var #tour
-        elif piece =='q':
-            return 90*var #dame
-        return 0
-        
 def is_win(board, tour, maximizing_player):
     if board.is_checkmate() and tour!=maximizing_player:
         return True
@@ -42,214 +38,537 @@ def is_lose(board, tour, maximizing_player):
 
 
 def is_draw(board):
-    if board.is_stalemate() or board.is_insufficient_material() or board.is_seventyfive_moves() or board.is_fivefold_repetition():
+    if board.is_stalemate() or nulle_reglementaire(board):
         return True
     return False
 
 
+def nulle_reglementaire(board):
+    """Nulle par manque de matériel, 75 coups ou quintuple répétition (le pat demande les coups légaux)"""
+    return board.is_insufficient_material() or board.is_seventyfive_moves() or board.is_fivefold_repetition()
+
+
 def evaluation_plateau(board, tour, maximizing_player, depth): 
     """
     Retourne un score au plateau en fonction du joueur dont c'est le tour (maximizing_player)
-    On suppose que les minuscules dans la chaîne renvoyée par board_fen() correspondent aux noirs(False)
+    Le score des positions non terminales vient de evaluateur (matériel et tables pièce-case)
     board.turn = tour = True => tour des blancs
     board.turn = tour = False => tour des noirs
     """
-    score=0
-    if is_lose(board, tour, maximizing_player):
-        return -900 * (4-depth) #L'adversaire fait échec et mat
-    elif is_win(board, tour, maximizing_player):
-        return 900 * (4-depth) #On a fait échec et mat
-    elif board.is_stalemate() or board.is_insufficient_material() or board.is_seventyfive_moves() or board.is_fivefold_repetition():
+    if board.is_checkmate():
+        if tour==maximizing_player:
+            return -SCORE_MAT * (4+depth) #L'adversaire fait échec et mat (le plus tard possible)
+        return SCORE_MAT * (4+depth) #On a fait échec et mat (le plus tôt possible)
+    elif is_draw(board):
         return 0
 
-    for elt in board.board_fen():
-        if elt == '/':
-            pass
-        else:
-            score+=evaluation_piece(elt, maximizing_player)
-    return score     
+    return evaluation_statique(board, maximizing_player)
 
-with open("openings_liste.txt", "rb") as fp:   # Unpickling
-    openings = pickle.load(fp)
 
+def evaluation_statique(board, maximizing_player):
+    """Score de evaluateur du point de vue de maximizing_player, sans tester la fin de partie"""
+    score = evaluateur.evaluer(board)
+    if maximizing_player:
+        return score
+    return -score
 
 
-def order_moves(board, moves):
-    ordered_moves = []
 
-    # 1. Les captures basées sur la méthode MVV-LVA (Most Valuable Victim - Least Valuable Attacker)
-    capture_scores = {}
-    for move in moves:
-        if board.is_capture(move):
-            captured_piece = board.piece_at(move.to_square)
-            capturing_piece = board.piece_at(move.from_square)
-            score = 10 * piece_value(captured_piece) - piece_value(capturing_piece)
-            capture_scores[move] = score
-    sorted_captures = sorted(capture_scores, key=capture_scores.get, reverse=True)
-    ordered_moves.extend(sorted_captures)
 
-    # 2. Promotions
-    promotion_moves = [move for move in moves if move.promotion]
-    ordered_moves.extend(promotion_moves)
+# Valeur des pièces pour MVV-LVA, indexée par piece_type (None, pion, cavalier, fou, tour, dame, roi)
+VALEUR_TYPE = [0, 1, 3, 3, 5, 9, 0]
 
-    # 3. Echecs
-    checking_moves = [move for move in moves if board.gives_check(move)]
-    ordered_moves.extend(checking_moves)
+# Priorités du tri des coups
+SCORE_COUP_TT = 1000000
+SCORE_CAPTURE = 100000
+SCORE_PROMOTION = 90000
+SCORE_KILLER = 80000
 
-    # 4. Les autres coups 
-    non_capture_moves = [move for move in moves if move not in ordered_moves]
-    ordered_moves.extend(non_capture_moves)
 
-    return ordered_moves
+def order_moves(board, moves, coup_tt=None, recherche=None):
+    """
+    Trie les coups en une seule passe : le coup de la table de transposition,
+    les captures (MVV-LVA : Most Valuable Victim - Least Valuable Attacker), les promotions,
+    les coups killer de ce ply, puis les autres coups selon la table d'historique.
+    """
+    if recherche is not None:
+        killers = recherche.killers.get(board.ply() - recherche.ply_racine, ())
+        history = recherche.history
+    else:
+        killers = ()
+        history = None
+    base_history = 4096 if board.turn else 0
+    ep_square = board.ep_square
+
+    def score(move):
+        if move == coup_tt:
+            return SCORE_COUP_TT
+        victime = board.piece_type_at(move.to_square)
+        attaquant = board.piece_type_at(move.from_square)
+        if victime is None and move.to_square == ep_square and attaquant == chess.PAWN:
+            victime = chess.PAWN
+        if victime is not None:
+            return SCORE_CAPTURE + 10 * VALEUR_TYPE[victime] - VALEUR_TYPE[attaquant]
+        if move.promotion:
+            return SCORE_PROMOTION + VALEUR_TYPE[move.promotion]
+        if move in killers:
+            return SCORE_KILLER
+        if history is not None:
+            return min(history[base_history + move.from_square * 64 + move.to_square], SCORE_KILLER - 1)
+        return 0
+
+    return sorted(moves, key=score, reverse=True)
 
 
 def piece_value(piece):
     if piece is None:
         return 0
+    return VALEUR_TYPE[piece.piece_type]
 
-    piece_type = piece.piece_type
-    if piece_type == chess.PAWN:
-        return 1
-    elif piece_type == chess.KNIGHT:
-        return 3
-    elif piece_type == chess.BISHOP:
-        return 3
-    elif piece_type == chess.ROOK:
-        return 5
-    elif piece_type == chess.QUEEN:
-        return 9
-    elif piece_type == chess.KING:
-        return 0
 
-    return 0
+# Quiescence : nombre maximum de demi-coups ajoutés après l'horizon et marge du delta pruning (2 pions)
+QUIESCENCE_MAX = 8
+MARGE_DELTA = 20
+
+
+def coups_tactiques(board):
+    """
+    Captures légales (prises avec promotion en dame seulement). Les promotions sans prise n'en font
+    pas partie : avec le stand pat, retarder une promotion gratuite ne coûterait plus rien à l'horizon
+    """
+    return [move for move in board.generate_legal_captures() if move.promotion in (None, chess.QUEEN)]
+
+
+def gain_materiel(board, move):
+    """Gain de matériel maximal d'un coup tactique, à l'échelle de minimax"""
+    if board.is_en_passant(move):
+        gain = VALEUR_TYPE[chess.PAWN]
+    else:
+        gain = piece_value(board.piece_at(move.to_square))
+    if move.promotion:
+        gain += VALEUR_TYPE[move.promotion] - VALEUR_TYPE[chess.PAWN]
+    return 10 * gain
+
 
+def prise_perdante(board, move):
+    """Vrai si la pièce prise vaut moins que celle qui prend et que la case d'arrivée est défendue"""
+    if move.promotion or board.is_en_passant(move):
+        return False
+    victime = board.piece_type_at(move.to_square)
+    attaquant = board.piece_type_at(move.from_square)
+    return VALEUR_TYPE[victime] < VALEUR_TYPE[attaquant] and board.is_attacked_by(not board.turn, move.to_square)
 
 
+def quiescence(board, alpha, beta, recherche=None, ply=0):
+    """
+    Prolonge la recherche à l'horizon sur les captures uniquement (voir coups_tactiques),
+    pour ne pas évaluer une position au milieu d'un échange (effet d'horizon).
+    Hors échec, le camp au trait peut s'arrêter sur l'évaluation statique (stand pat).
+    Le score est donné du point de vue du camp au trait (negamax).
+    """
+    if recherche is not None:
+        recherche.compter_noeud()
+
+    if board.is_check():
+        # En échec on ne peut pas s'arrêter : on regarde toutes les parades
+        moves = list(board.legal_moves)
+        if not moves:
+            return evaluation_plateau(board, board.turn, board.turn, 0)
+        if ply >= QUIESCENCE_MAX:
+            return evaluation_statique(board, board.turn)
+        stand_pat = None
+        score = -inf
+    else:
+        stand_pat = evaluation_statique(board, board.turn)
+        if ply >= QUIESCENCE_MAX or stand_pat >= beta:
+            return stand_pat
+        alpha = max(alpha, stand_pat)
+        score = stand_pat
+        moves = coups_tactiques(board)
+
+    for move in order_moves(board, moves):
+        # Delta pruning : même en gagnant la pièce (et une marge), on ne peut pas améliorer le score
+        if stand_pat is not None and stand_pat + gain_materiel(board, move) + MARGE_DELTA <= alpha:
+            continue
+        # Prise perdante : pièce prise moins chère que la pièce qui prend, sur une case défendue
+        if stand_pat is not None and prise_perdante(board, move):
+            continue
+        board.push(move)
+        val_board = -quiescence(board, -beta, -alpha, recherche, ply+1)
+        board.pop()
+        score = max(score, val_board)
+        alpha = max(alpha, score)
+        if alpha >= beta:
+            break
+    return score
+
+
+def add_to_transposition_table(board_key, score, flag, move, depth, maximizing_player):
+    """Les scores sont stockés du point de vue des blancs pour que la table serve aux deux camps"""
+    if not maximizing_player:
+        score = -score
+        flag = inverser_borne(flag)
+    transposition_table.store(board_key, score, flag, depth, move)
+
+
+def lookup_transposition_table(board_key, maximizing_player):
+    """Renvoie (score, flag, move, depth) du point de vue de maximizing_player, ou None"""
+    entree = transposition_table.lookup(board_key)
+    if entree is None:
+        return None
+    _, depth, flag, score, move, _ = entree
+    if not maximizing_player:
+        score = -score
+        flag = inverser_borne(flag)
+    return score, flag, move, depth
+
+
+class TempsEcoule(Exception):
+    """Levée pendant la recherche quand le budget (temps ou noeuds) est épuisé"""
+
+
+class Recherche:
+    """
+    Budget et compteurs d'une recherche. Chaque requête a sa propre instance,
+    ce qui permet de lancer plusieurs recherches en parallèle.
+    `arret` (threading.Event) permet d'interrompre la recherche depuis un autre thread.
+    """
+    def __init__(self, temps_max=None, noeuds_max=None, arret=None):
+        self.debut = time.perf_counter()
+        self.limite = None if temps_max is None else self.debut + temps_max
+        self.noeuds_max = noeuds_max
+        self.arret = arret
+        self.noeuds = 0
+        self.tt_hits = 0
+        self.coupures = 0
+        self.profondeur = 0
+        self.score = None
+        self.pv = []
+        # Une entrée par itération terminée : (profondeur, score, coup, noeuds, temps)
+        self.iterations = []
+        # Heuristiques de tri : deux coups killer par ply et table d'historique (couleur, départ, arrivée)
+        self.ply_racine = 0
+        self.killers = {}
+        self.history = [0] * 8192
+
+    def coupure(self, board, move, depth):
+        """Mémorise un coup calme qui a provoqué une coupure beta"""
+        self.coupures += 1
+        if board.is_capture(move) or move.promotion:
+            return
+        ply = board.ply() - self.ply_racine
+        killers = self.killers.setdefault(ply, [])
+        if move not in killers:
+            killers.insert(0, move)
+            del killers[2:]
+        self.history[(4096 if board.turn else 0) + move.from_square * 64 + move.to_square] += depth * depth
+
+    def compter_noeud(self):
+        self.noeuds += 1
+        if self.noeuds_max is not None and self.noeuds > self.noeuds_max:
+            raise TempsEcoule()
+        # On ne regarde l'horloge (et la demande d'arrêt) que tous les 256 noeuds
+        if self.noeuds & 255 == 0:
+            if self.limite is not None and time.perf_counter() > self.limite:
+                raise TempsEcoule()
+            if self.arret is not None and self.arret.is_set():
+                raise TempsEcoule()
+
+    def temps_ecoule(self):
+        return time.perf_counter() - self.debut
+
+    def meilleur_coup(self):
+        """Premier coup de la variation principale de la dernière itération terminée"""
+        pv = self.pv
+        return pv[0] if pv else None
+
+    def progression(self):
+        """Etat de la recherche en cours : dernière profondeur terminée, coup, score, noeuds et noeuds/s"""
+        temps = self.temps_ecoule()
+        return {
+            'profondeur': self.profondeur,
+            'meilleur_coup': None if self.meilleur_coup() is None else str(self.meilleur_coup()),
+            'score': self.score,
+            'pv': [str(move) for move in self.pv],
+            'noeuds': self.noeuds,
+            'tt_hits': self.tt_hits,
+            'coupures': self.coupures,
+            'nps': int(self.noeuds / temps) if temps > 0 else 0,
+            'temps': round(temps, 3),
+        }
+
+
+def extraire_pv(board, depth):
+    """Variation principale lue dans la table de transposition à partir de board"""
+    pv = []
+    board = board.copy(stack=False)
+    for _ in range(depth):
+        entree = transposition_table.lookup(cle_transposition(board))
+        if entree is None or entree[4] is None or not board.is_legal(entree[4]):
+            break
+        pv.append(entree[4])
+        board.push(entree[4])
+    return pv
+
+
+# Null move : réduction de la recherche après un coup passé, et profondeur à partir de laquelle
+# une coupure est confirmée par une recherche réduite sans null move (zugzwang)
+REDUCTION_NULL_MOVE = 2
+PROFONDEUR_VERIFICATION = 5
+# Late move reductions : à partir de PROFONDEUR_LMR, les coups calmes après les COUPS_SANS_REDUCTION
+# premiers sont cherchés avec un demi-coup de moins (deux au-delà de COUPS_REDUCTION_DOUBLE)
+PROFONDEUR_LMR = 2
+COUPS_SANS_REDUCTION = 3
+COUPS_REDUCTION_DOUBLE = 8
+# Largeur de la fenêtre nulle de la PVS (un dixième de pion)
+FENETRE_NULLE = 1
+
+
+def score_finale(wdl, depth):
+    """Score negamax d'un résultat WDL des tables (les gains annulés par la règle des 50 coups sont nuls)"""
+    if wdl >= 2:
+        return SCORE_FINALE + depth
+    if wdl <= -2:
+        return -SCORE_FINALE - depth
+    return 0
 
 
+def pieces_hors_pions(board, couleur):
+    """Vrai si couleur a au moins une pièce autre que le roi et les pions"""
+    return bool(board.occupied_co[couleur] & ~(board.pawns | board.kings))
 
-def add_to_transposition_table(board_str, score, move, depth):
-    transposition_table[board_str] = (score, move, depth)
 
-    if len(transposition_table) > MAX_TRANSPOSITION_TABLE_SIZE:
-        # On enlève l'entrée la moins récente
-        oldest_entry = min(transposition_table.keys(), key=lambda k: transposition_table[k][2])
-        del transposition_table[oldest_entry]
+def minimax(board, tour, maximizing_player, nb_coups, alpha=-inf, beta=inf, depth=PROFONDEUR_DEFAUT, recherche=None):
+    """
+    Renvoi le meilleur coup à jouer et le score au plateau (du point de vue de maximizing_player)
+    après que ce coup soit joué. Si une recherche est fournie, lève TempsEcoule quand son budget est dépassé
+    nb_coups (les coups de la partie) ne sert qu'au livre d'ouvertures, consulté par recherche_iterative
+    """
+    if tour == maximizing_player:
+        return negamax(board, alpha, beta, depth, recherche)
+    score, best_move = negamax(board, -beta, -alpha, depth, recherche)
+    return -score, best_move
 
 
-def lookup_transposition_table(board_str):
-    if board_str in transposition_table:
-        return transposition_table[board_str]
-    return None
+def negamax(board, alpha, beta, depth, recherche=None, null_move=True):
+    """
+    Alpha-beta en negamax : renvoie (score du point de vue du camp au trait, meilleur coup).
+    Le premier coup est cherché avec la fenêtre complète, les suivants avec une fenêtre nulle
+    (PVS) et ne sont recherchés normalement que s'ils battent alpha. S'y ajoutent le null move
+    et les late move reductions. null_move est faux juste après un coup passé.
+    """
+    if recherche is not None:
+        recherche.compter_noeud()
+
+    board_key = cle_transposition(board)
+    alpha_origine, beta_origine = alpha, beta
+    coup_tt = None
+    transposition_entry = lookup_transposition_table(board_key, board.turn)
+    if transposition_entry is not None:
+        if recherche is not None:
+            recherche.tt_hits += 1
+        score_tt, flag_tt, coup_tt, depth_tt = transposition_entry
+        # Pas de coupure à la racine : il faut un coup, et une entrée des tables de finales
+        # (sans coup) y viendrait d'une recherche précédente, quand finales.meilleur_coup a échoué
+        racine = recherche is not None and board.ply() == recherche.ply_racine
+        if not racine and depth_tt >= depth and (coup_tt is None or board.is_legal(coup_tt)):
+            if flag_tt == EXACT:
+                return score_tt, coup_tt
+            elif flag_tt == LOWERBOUND:
+                alpha = max(alpha, score_tt)
+            elif flag_tt == UPPERBOUND:
+                beta = min(beta, score_tt)
+            if beta <= alpha:
+                return score_tt, coup_tt
+
+    # Position dans les tables de finales : score exact, inutile de chercher plus loin
+    # (à la racine, le coup vient de finales.meilleur_coup dans recherche_iterative)
+    if recherche is None or board.ply() > recherche.ply_racine:
+        wdl = finales.wdl(board)
+        if wdl is not None:
+            score = score_finale(wdl, max(depth, 0))
+            add_to_transposition_table(board_key, score, EXACT, None, PROFONDEUR_MAX, board.turn)
+            return score, None
+
+    if depth<=0 and not is_draw(board):
+        # A l'horizon on termine les échanges en cours avant d'évaluer
+        score = quiescence(board, alpha, beta, recherche)
+        if score <= alpha_origine:
+            flag = UPPERBOUND
+        elif score >= beta_origine:
+            flag = LOWERBOUND
+        else:
+            flag = EXACT
+        add_to_transposition_table(board_key, score, flag, None, 0, board.turn)
+        return score, None
 
+    # Les coups légaux ne sont générés qu'une fois : fin de partie puis tri
+    moves = list(board.legal_moves) if depth > 0 else []
+    if not moves or nulle_reglementaire(board):
+        score = evaluation_plateau(board, board.turn, board.turn, max(depth, 0))
+        add_to_transposition_table(board_key, score, EXACT, None, max(depth, 0), board.turn)
+        return score, None
 
-def minimax(board, tour, maximizing_player, nb_coups, alpha=-inf, beta=inf, depth=3):
+    en_echec = board.is_check()
+    # Null move : si passer son tour suffit à dépasser beta, un vrai coup le fera aussi.
+    # Faux en zugzwang, d'où les garde-fous : pas en échec, pas deux coups passés de suite,
+    # pas sans pièce (finales de pions) et vérification aux grandes profondeurs.
+    if (null_move and not en_echec and depth > REDUCTION_NULL_MOVE and abs(beta) < SCORE_MAT * 4
+            and pieces_hors_pions(board, board.turn) and evaluation_statique(board, board.turn) >= beta):
+        board.push(chess.Move.null())
+        score = -negamax(board, -beta, -beta + FENETRE_NULLE, depth - 1 - REDUCTION_NULL_MOVE, recherche, False)[0]
+        board.pop()
+        if score >= beta:
+            # Un mat trouvé après un coup passé n'est pas prouvé
+            score = min(score, SCORE_MAT * 4 - 1)
+            if depth < PROFONDEUR_VERIFICATION or negamax(board, beta - FENETRE_NULLE, beta,
+                                                          depth - 1 - REDUCTION_NULL_MOVE, recherche, False)[0] >= beta:
+                return score, None
+
+    # Le meilleur coup trouvé précédemment pour cette position est essayé en premier
+    ordered_moves = order_moves(board, moves, coup_tt, recherche)
+    killers = recherche.killers.get(board.ply() - recherche.ply_racine, ()) if recherche is not None else ()
+    best_move = None
+    score = -inf
+    for i, move in enumerate(ordered_moves):
+        tactique = board.is_capture(move) or move.promotion
+        board.push(move)
+        if i == 0:
+            val_board = -negamax(board, -beta, -alpha, depth-1, recherche)[0]
+        else:
+            reduction = 0
+            # Pas de réduction en échec ni quand alpha est un score de mat : elle ferait manquer le mat
+            if (depth >= PROFONDEUR_LMR and i >= COUPS_SANS_REDUCTION and not tactique and not en_echec
+                    and -SCORE_MAT * 4 < alpha < SCORE_MAT * 4 and move not in killers and not board.is_check()):
+                reduction = 2 if i >= COUPS_REDUCTION_DOUBLE and depth > PROFONDEUR_LMR else 1
+            val_board = -negamax(board, -alpha - FENETRE_NULLE, -alpha, depth-1-reduction, recherche)[0]
+            if val_board > alpha and reduction:
+                # Le coup réduit bat alpha : on le vérifie à pleine profondeur
+                val_board = -negamax(board, -alpha - FENETRE_NULLE, -alpha, depth-1, recherche)[0]
+            if alpha < val_board < beta:
+                val_board = -negamax(board, -beta, -alpha, depth-1, recherche)[0]
+        board.pop()
+        if val_board > score or best_move is None:
+            score = val_board
+            best_move = move
+        alpha = max(alpha, score)
+        if alpha >= beta:
+            if recherche is not None:
+                recherche.coupure(board, move, depth)
+            break
+
+    # Type de borne par rapport à la fenêtre reçue en entrée
+    if score <= alpha_origine:
+        flag = UPPERBOUND
+    elif score >= beta_origine:
+        flag = LOWERBOUND
+    else:
+        flag = EXACT
+    add_to_transposition_table(board_key, score, flag, best_move, depth, board.turn)
+    return (score, best_move)
+
+
+def recherche_iterative(board, nb_coups, temps_max=None, noeuds_max=None, depth_max=None, recherche=None, livre_ouvertures=True):
     """
-    Renvoi le meilleur coup à jouer et le score au plateau après que ce coup soit joué
+    Approfondissement itératif : lance negamax à la profondeur 1, 2, 3... jusqu'à depth_max
+    ou jusqu'à épuisement du budget (temps_max en secondes, noeuds_max en noeuds).
+    Chaque itération commence par la variation principale de la précédente, gardée dans la
+    table de transposition. Renvoie (score, coup) de la dernière itération terminée,
+    ou (None, coup) pour un coup du livre d'ouvertures (sauf si livre_ouvertures est faux).
     """
     #On vérifie si on est dans une ouverture
-    if len(nb_coups) <= 10 :
-        nb_coups_joues = len(nb_coups)
-        #Si on est au premier coup, on joue une ouverture aléatoire
-        if nb_coups_joues==0 and tour == True:
-            return (None, openings[randrange(0,len(openings))][0])
-        #On cherche la même configuration dans la liste des ouvertures
-        r = randrange(1,10)
-        rd = 1
-        for i in range(len(openings)):
-            if nb_coups==openings[i][:nb_coups_joues]:
-                coup_secours = (None, openings[i][nb_coups_joues])
-                print(coup_secours)
-                if r==rd:
-                    return (None, openings[i][nb_coups_joues])
-                rd += 1
-        try:
-            return coup_secours
-        except:
-            pass
-    
-    """board_str = board.fen()
-    transposition_entry = lookup_transposition_table(board_str)
-    if transposition_entry and transposition_entry[2] >= depth:
-        return transposition_entry[0], transposition_entry[1]"""
-
-    moves = [move for move in board.legal_moves]
-    #ordered_moves = order_moves(board, moves)
-    ordered_moves = moves
-
-    if board.legal_moves.count()==0 or depth==0 or is_win(board,tour,maximizing_player) or is_lose(board, tour, maximizing_player) or is_draw(board):
-        score = evaluation_plateau(board, tour, maximizing_player, depth)
-        """add_to_transposition_table(board_str, score, None, depth)"""
-        return score, None
-    board.push(moves[0])
-    score = minimax(board,not tour, maximizing_player, nb_coups+[str(ordered_moves[0])], alpha,beta, depth-1)[0]
-    best_move=board.pop()
-    if tour==maximizing_player: #On cherche le Max
-        for move in ordered_moves[1:]:
-            board.push(move)
-            """add_to_transposition_table(board_str, score, move, depth)"""
-            val_board = minimax(board,not tour, maximizing_player, nb_coups+[str(move)], alpha,beta, depth-1)[0]
-        
-            if val_board>score:
-                score= val_board
-                best_move = board.pop()
-            else:
-                board.pop()
-            alpha = max(alpha, score)
-            if beta<=alpha:
+    if livre_ouvertures and dans_ouverture(len(nb_coups)):
+        coup_livre = livre.coup(board)
+        if coup_livre is not None:
+            mesures.incrementer("livre_coups", algo="minimax")
+            journal.debug("minimax : coup du livre %s", coup_livre)
+            return (None, coup_livre)
+    coup_table, wdl = finales.meilleur_coup(board)
+    if coup_table is not None:
+        mesures.incrementer("finales_coups", algo="minimax")
+        journal.debug("minimax : coup des tables de finales %s (wdl %d)", coup_table, wdl)
+        return (score_finale(wdl, 0), coup_table)
+    if depth_max is None:
+        depth_max = PROFONDEUR_DEFAUT if temps_max is None and noeuds_max is None else PROFONDEUR_MAX
+    if recherche is None:
+        recherche = Recherche(temps_max, noeuds_max)
+    # Une recherche interrompue laisse des coups sur le plateau : on travaille sur une copie
+    board = board.copy()
+    recherche.ply_racine = board.ply()
+    score, best_move = None, None
+    transposition_table.nouvelle_recherche()
+    try:
+        for depth in range(1, depth_max + 1):
+            try:
+                resultat = negamax(board, -inf, inf, depth, recherche)
+            except TempsEcoule:
                 break
-            
-    else: #On cherche le Min
-        for move in moves:
-            board.push(move)
-            val_board = minimax(board,not tour, maximizing_player, nb_coups+[str(move)], alpha,beta, depth-1)[0]
-            """add_to_transposition_table(board_str, score, move, depth)"""
-            if val_board<score:
-                score = val_board
-                best_move = board.pop()
-            else:
-                board.pop()
-            beta = min(beta, score)
-            if beta<=alpha:
+            score, best_move = resultat
+            recherche.profondeur = depth
+            recherche.score = score
+            recherche.pv = extraire_pv(board, depth)
+            recherche.iterations.append((depth, score, best_move, recherche.noeuds, recherche.temps_ecoule()))
+            if best_move is None or abs(score) >= SCORE_MAT * 4:
+                # Partie terminée ou mat trouvé : inutile d'aller plus loin
                 break
-    return (score, best_move) 
+    finally:
+        transposition_table.fin_recherche()
+    if best_move is None and not board.is_game_over():
+        # Budget épuisé avant la fin de la première itération
+        best_move = next(iter(board.legal_moves))
+    publier(recherche)
+    journal.debug("minimax : %s score %s profondeur %d, %d noeuds en %.3f s",
+                  best_move, score, recherche.profondeur, recherche.noeuds, recherche.temps_ecoule())
+    return score, best_move
+
+
+def publier(recherche):
+    """Ajoute les compteurs d'une recherche terminée aux mesures du processus"""
+    mesures.incrementer("minimax_recherches")
+    mesures.incrementer("minimax_noeuds", recherche.noeuds)
+    mesures.incrementer("minimax_tt_hits", recherche.tt_hits)
+    mesures.incrementer("minimax_coupures", recherche.coupures)
+    mesures.observer("minimax_recherche_secondes", recherche.temps_ecoule())
+    finales.publier()
 
-import time
 class JoueurMinimax():
-    def __init__(self,board, ma_couleur):
+    """Joueur minimax pour une partie en console ou un match (voir match.py)"""
+    def __init__(self,board, ma_couleur, profondeur=PROFONDEUR_DEFAUT, temps=None):
         self.board = board
         self.color = ma_couleur=="white" or ma_couleur=="blanc"
-        self.score = evaluation_plateau(board, board.turn, board.turn)
+        self.profondeur = profondeur
+        self.temps = temps
+        self.score = evaluation_plateau(board, board.turn, self.color, 0)
         
     def is_my_turn(self,new_board):
         if new_board.turn == self.color:
             self.board=new_board
-            self.score = evaluation_plateau(board, board.turn, board.turn)
+            self.score = evaluation_plateau(self.board, self.board.turn, self.color, 0)
             return True
         return False
     def is_win(self):
-        if self.score==inf:
+        if self.board.is_checkmate() and self.board.turn != self.color:
             print('Victoire des: ', self.color)
-            time.sleep(5)
             return True
             
         return False
     def is_lose(self):
-        if self.score==-inf:
+        if self.board.is_checkmate() and self.board.turn == self.color:
             print('Victoire des: ', not self.color)
-            time.sleep(5)
             return True
         return False
+    def choisir(self, board):
+        """Coup à jouer dans board, sans le jouer"""
+        return recherche_iterative(board, board.move_stack, self.temps, None, self.profondeur)[1]
     def jouer(self, new_board):
-        print(self.is_my_turn(new_board), new_board.turn, self.color)
-        if self.is_my_turn(new_board) and not is_lose(new_board, board.turn, self.color) and not is_draw(board):
-            print("je joue")
-            self.board.push(minimax(self.board)[1])
+        if self.is_my_turn(new_board) and not self.board.is_game_over():
+            self.board.push(self.choisir(self.board))
             return self.board
         return new_board
     
 
 class JoueurAleatoire:
+    """Joue un coup légal au hasard"""
     def __init__(self, board, ma_couleur):
         self.board = board
         self.color = ma_couleur=="white" or ma_couleur=="blanc"
@@ -260,24 +579,21 @@ class JoueurAleatoire:
             return True
         return False
     def is_win(self):
-        if self.score==inf:
+        if self.board.is_checkmate() and self.board.turn != self.color:
             print('Victoire des: ', self.color)
-            time.sleep(5)
             return True
             
         return False
     def is_lose(self):
-        if self.score==-inf:
+        if self.board.is_checkmate() and self.board.turn == self.color:
             print('Victoire des: ', not self.color)
-            time.sleep(5)
             return True
         return False
+    def choisir(self, board):
+        return random.choice(list(board.legal_moves))
     def jouer(self, new_board):
-        print(self.is_my_turn(new_board), new_board.turn, self.color)
-        if self.is_my_turn(new_board) and not is_lose(new_board, board.turn, self.color) and not is_draw(board):
-            moves = [move for move in board.legal_moves]
-            print("je joue")
-            self.board.push(random.choice(moves))
+        if self.is_my_turn(new_board) and not self.board.is_game_over():
+            self.board.push(self.choisir(self.board))
             return self.board
         return new_board
     
@@ -301,11 +617,12 @@ def move_player():
 #mat en 3 : (le programme y arrive)
 #board=chess.Board("4R2B/5N1k/6pP/6P1/8/1p6/1p6/QK6")
 board = chess.Board()
-print(board)
-print("\n")
-print(board.turn)
-print("\n")
-print(board.legal_moves)
+if __name__ == "__main__":
+    print(board)
+    print("\n")
+    print(board.turn)
+    print("\n")
+    print(board.legal_moves)
 """
 while not board.is_checkmate():
     move_minimax = minimax(board, board.turn, board.turn)[1]
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Moteur UCI minimal, pour faire tourner le pool de moteurs et MCTS sans Stockfish :
+    CHESS_ENGINE_PATH=./moteur_stub.py python app.py
+Il joue le premier coup légal (dans l'ordre de python-chess) et donne le matériel comme score.
+Options pour simuler les pannes : --lent SECONDES (attend avant chaque réponse à go)
+et --plantage N (le processus s'arrête au N-ième go).
+"""
+import argparse
+import sys
+import time
+import chess
+from evaluation import materiel, VALEURS_MCTS
+
+
+def lire_position(mots):
+    """Commande UCI 'position [startpos | fen ...] [moves ...]'"""
+    if "moves" in mots:
+        i = mots.index("moves")
+        moves = mots[i + 1:]
+        mots = mots[:i]
+    else:
+        moves = []
+    if mots[1] == "fen":
+        board = chess.Board(" ".join(mots[2:]))
+    else:
+        board = chess.Board()
+    for move in moves:
+        board.push_uci(move)
+    return board
+
+
+def repondre(*lignes):
+    for ligne in lignes:
+        sys.stdout.write(ligne + "\n")
+    sys.stdout.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lent", type=float, default=0)
+    parser.add_argument("--plantage", type=int, default=0)
+    args = parser.parse_args()
+
+    board = chess.Board()
+    multipv = 1
+    nb_go = 0
+    for ligne in sys.stdin:
+        mots = ligne.split()
+        if not mots:
+            continue
+        commande = mots[0]
+        if commande == "uci":
+            repondre("id name moteur_stub", "id author IAchess",
+                     "option name MultiPV type spin default 1 min 1 max 500", "uciok")
+        elif commande == "isready":
+            repondre("readyok")
+        elif commande == "setoption" and len(mots) >= 5 and mots[2] == "MultiPV":
+            multipv = int(mots[4])
+        elif commande == "ucinewgame":
+            board = chess.Board()
+        elif commande == "position":
+            board = lire_position(mots)
+        elif commande == "go":
+            nb_go += 1
+            if args.plantage and nb_go >= args.plantage:
+                sys.exit(1)
+            if args.lent:
+                time.sleep(args.lent)
+            moves = list(board.legal_moves)
+            # Score en centipions du point de vue du camp au trait
+            score = 100 * materiel(board, VALEURS_MCTS) * (1 if board.turn else -1)
+            for i, move in enumerate(moves[:multipv]):
+                repondre(f"info depth 1 seldepth 1 multipv {i + 1} score cp {score} nodes 1 pv {move.uci()}")
+            repondre(f"bestmove {moves[0].uci()}" if moves else "bestmove (none)")
+        elif commande == "quit":
+            break
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import os
+import pickle
+import struct
+import threading
+import chess
+import chess.polyglot
+
+
+DOSSIER = os.path.dirname(os.path.abspath(__file__))
+# Liste picklée des ouvertures (une liste de chess.Move par ouverture)
+FICHIER_OUVERTURES = os.path.join(DOSSIER, "openings_liste.txt")
+# Livre compilé au format polyglot : entrées de 16 octets triées par hash Zobrist
+FICHIER_LIVRE = os.path.join(DOSSIER, "openings.bin")
+# On ne consulte le livre que pendant les premiers demi-coups
+NB_COUPS_LIVRE = 10
+
+ENTREE_POLYGLOT = struct.Struct(">QHHI")
+
+
+def dans_ouverture(demi_coups):
+    """Vrai si le livre est consulté après demi_coups demi-coups joués, la même limite pour minimax et MCTS"""
+    return demi_coups <= NB_COUPS_LIVRE
+
+
+def coup_polyglot(board, move):
+    """Encodage polyglot d'un coup (le roque est noté roi prend sa tour)"""
+    to_square = move.to_square
+    if board.is_castling(move):
+        to_square = chess.square(7 if board.is_kingside_castling(move) else 0, chess.square_rank(move.from_square))
+    promotion = move.promotion - 1 if move.promotion else 0
+    return chess.square_file(to_square) | chess.square_rank(to_square) << 3 | \
+        chess.square_file(move.from_square) << 6 | chess.square_rank(move.from_square) << 9 | promotion << 12
+
+
+def compiler_livre(source=FICHIER_OUVERTURES, destination=FICHIER_LIVRE):
+    """
+    Compile la liste picklée des ouvertures en livre polyglot.
+    Chaque position rencontrée dans les ouvertures est indexée par son hash Zobrist,
+    avec pour poids le nombre d'ouvertures qui y jouent ce coup.
+    """
+    with open(source, "rb") as fp:
+        openings = pickle.load(fp)
+    poids = {}
+    for opening in openings:
+        board = chess.Board()
+        for move in opening:
+            if not board.is_legal(move):
+                break
+            entree = (chess.polyglot.zobrist_hash(board), coup_polyglot(board, move))
+            poids[entree] = poids.get(entree, 0) + 1
+            board.push(move)
+    # Écriture dans un fichier temporaire puis renommage, pour ne jamais lire un livre à moitié écrit
+    temporaire = destination + ".tmp"
+    with open(temporaire, "wb") as fp:
+        for (cle, move), weight in sorted(poids.items()):
+            fp.write(ENTREE_POLYGLOT.pack(cle, move, min(weight, 0xFFFF), 0))
+    os.replace(temporaire, destination)
+
+
+class Livre:
+    """
+    Livre d'ouvertures mappé en mémoire : une recherche est une dichotomie sur le hash
+    de la position, le coup est tiré au hasard proportionnellement à son poids.
+    Le livre est compilé depuis la liste picklée au premier usage s'il n'existe pas encore
+    (python ouvertures.py pour le recompiler).
+    """
+    def __init__(self, fichier=FICHIER_LIVRE, source=FICHIER_OUVERTURES):
+        self.fichier = fichier
+        self.source = source
+        self.lecteur = None
+        self.verrou = threading.Lock()
+
+    def ouvrir(self):
+        if self.lecteur is None:
+            with self.verrou:
+                if self.lecteur is None:
+                    if not os.path.exists(self.fichier):
+                        compiler_livre(self.source, self.fichier)
+                    self.lecteur = chess.polyglot.open_reader(self.fichier)
+        return self.lecteur
+
+    def coup(self, board, rng=None):
+        """Coup du livre pour cette position, ou None si la position n'y est pas"""
+        try:
+            return self.ouvrir().weighted_choice(board, random=rng).move
+        except IndexError:
+            return None
+
+    def close(self):
+        if self.lecteur is not None:
+            self.lecteur.close()
+            self.lecteur = None
+
+
+livre = Livre()
+
+
+if __name__ == "__main__":
+    compiler_livre()
@@ -0,0 +1,75 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+import chess
+
+
+# Une partie sans requête pendant DUREE_INACTIVITE secondes est oubliée
+DUREE_INACTIVITE = 3600
+# Nombre maximal de parties gardées en mémoire (les moins récemment jouées partent en premier)
+NB_PARTIES_MAX = 1000
+
+
+class Partie:
+    """
+    Partie tenue par le serveur : le plateau garde la pile des coups, le client n'envoie
+    que son dernier coup. `travail` est la recherche en cours pour cette partie, s'il y en a une.
+    """
+    def __init__(self, board):
+        self.id = uuid.uuid4().hex
+        self.board = board
+        self.travail = None
+        self.verrou = threading.Lock()
+        self.derniere_utilisation = time.monotonic()
+
+    def occupee(self):
+        return self.travail is not None and not self.travail.termine()
+
+    def description(self):
+        return {'id': self.id, 'fen': self.board.fen(), 'coups': [move.uci() for move in self.board.move_stack]}
+
+
+class Parties:
+    """Parties en cours, indexées par identifiant, avec éviction des parties inactives"""
+    def __init__(self, duree_inactivite=DUREE_INACTIVITE, nb_max=NB_PARTIES_MAX):
+        self.duree_inactivite = duree_inactivite
+        self.nb_max = nb_max
+        self.parties = OrderedDict()
+        self.verrou = threading.Lock()
+
+    def _oublier_inactives(self):
+        # Appelé avec le verrou ; les parties sont rangées de la moins à la plus récemment utilisée
+        limite = time.monotonic() - self.duree_inactivite
+        while self.parties:
+            partie = next(iter(self.parties.values()))
+            if partie.derniere_utilisation >= limite and len(self.parties) <= self.nb_max:
+                break
+            self.parties.popitem(last=False)
+
+    def creer(self, fen=None, coups=()):
+        """Nouvelle partie depuis fen (position initiale par défaut) suivie des coups UCI. ValueError si invalide"""
+        board = chess.Board(fen) if fen else chess.Board()
+        for coup in coups:
+            board.push(board.parse_uci(coup))
+        partie = Partie(board)
+        with self.verrou:
+            self.parties[partie.id] = partie
+            self._oublier_inactives()
+        return partie
+
+    def get(self, id):
+        with self.verrou:
+            partie = self.parties.get(id)
+            if partie is not None:
+                partie.derniere_utilisation = time.monotonic()
+                self.parties.move_to_end(id)
+            self._oublier_inactives()
+            return partie
+
+    def supprimer(self, id):
+        with self.verrou:
+            return self.parties.pop(id, None)
+
+
+parties = Parties()
@@ -0,0 +1,131 @@
+import asyncio
+import contextlib
+import queue
+import threading
+import chess.engine
+from ressources import RessourceIndisponible
+
+
+# Erreurs après lesquelles un processus moteur n'est plus réutilisé
+ERREURS_MOTEUR = (chess.engine.EngineError, TimeoutError, asyncio.TimeoutError, RuntimeError)
+
+
+class PoolMoteurs:
+    """
+    Pool de processus moteur UCI partagé entre les threads des requêtes.
+    Chaque appel emprunte un moteur libre (ou en lance un nouveau tant qu'on est sous `taille`),
+    vérifie qu'il répond toujours, et le rend à la fin. Un moteur qui plante ou dépasse
+    son délai est arrêté puis remplacé au prochain emprunt.
+    """
+    def __init__(self, commande, taille=1, timeout=10.0):
+        self.commande = commande
+        self.taille = taille
+        self.timeout = timeout
+        self.libres = queue.LifoQueue()
+        self.places = threading.BoundedSemaphore(taille)
+        self.verrou = threading.Lock()
+        self.moteurs = set()
+        self.erreur = None
+        self.redemarrages = 0
+
+    def lancer(self):
+        """Lance un nouveau processus moteur. Un exécutable introuvable n'est pas relancé à chaque appel"""
+        if self.erreur is not None:
+            raise RessourceIndisponible(self.commande) from self.erreur
+        try:
+            moteur = chess.engine.SimpleEngine.popen_uci(self.commande, timeout=self.timeout)
+        except OSError as e:
+            self.erreur = e
+            raise RessourceIndisponible(self.commande) from e
+        except ERREURS_MOTEUR as e:
+            raise RessourceIndisponible(self.commande) from e
+        with self.verrou:
+            self.moteurs.add(moteur)
+        return moteur
+
+    def en_vie(self, moteur):
+        try:
+            moteur.ping()
+            return True
+        except ERREURS_MOTEUR:
+            return False
+
+    def arreter(self, moteur):
+        with self.verrou:
+            self.moteurs.discard(moteur)
+        try:
+            moteur.close()
+        except Exception:
+            pass
+
+    def emprunter(self, attente=None):
+        """Moteur libre et en état de marche. Lève TimeoutError si aucun ne se libère en `attente` secondes"""
+        if not self.places.acquire(timeout=attente):
+            raise TimeoutError("aucun moteur libre")
+        try:
+            try:
+                moteur = self.libres.get_nowait()
+            except queue.Empty:
+                moteur = None
+            if moteur is not None and not self.en_vie(moteur):
+                self.arreter(moteur)
+                self.redemarrages += 1
+                moteur = None
+            if moteur is None:
+                moteur = self.lancer()
+            return moteur
+        except BaseException:
+            self.places.release()
+            raise
+
+    def rendre(self, moteur, casse=False):
+        if casse:
+            self.arreter(moteur)
+            self.redemarrages += 1
+        else:
+            self.libres.put(moteur)
+        self.places.release()
+
+    @contextlib.contextmanager
+    def moteur(self, attente=None):
+        moteur = self.emprunter(attente)
+        casse = False
+        try:
+            yield moteur
+        except ERREURS_MOTEUR:
+            casse = True
+            raise
+        finally:
+            self.rendre(moteur, casse)
+
+    def appeler(self, fonction, timeout=None, attente=None):
+        """
+        Exécute fonction(protocol) sur un moteur du pool avec un délai maximal de `timeout` secondes
+        (par défaut le délai du pool). fonction renvoie une coroutine du protocole UCI de python-chess.
+        Au-delà du délai, le processus moteur est tué : annuler la commande en cours laisserait
+        le thread de python-chess bloqué à la fermeture et l'interpréteur ne pourrait plus sortir.
+        """
+        if timeout is None:
+            timeout = self.timeout
+        with self.moteur(attente) as moteur:
+            future = asyncio.run_coroutine_threadsafe(fonction(moteur.protocol), moteur.protocol.loop)
+            try:
+                return future.result(timeout)
+            except TimeoutError:
+                # La commande se termine alors normalement, en erreur (EngineTerminatedError)
+                moteur.protocol.loop.call_soon_threadsafe(moteur.transport.kill)
+                raise
+
+    def play(self, board, limit, timeout=None, attente=None, **kwargs):
+        return self.appeler(lambda protocol: protocol.play(board, limit, **kwargs), timeout, attente)
+
+    def analyse(self, board, limit, timeout=None, attente=None, **kwargs):
+        return self.appeler(lambda protocol: protocol.analyse(board, limit, **kwargs), timeout, attente)
+
+    def fermer(self):
+        with self.verrou:
+            moteurs = list(self.moteurs)
+        for moteur in moteurs:
+            self.arreter(moteur)
+        while not self.libres.empty():
+            self.libres.get_nowait()
@@ -0,0 +1,214 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+import chess
+from transposition import cle_zobrist
+from ressources import POSITIONS_DB, POSITIONS_MAX, QUALITE_MIN, a_la_sortie
+from instrumentation import mesures, journal
+
+
+# Nombre de résultats gardés en mémoire devant la base
+TAILLE_CACHE_POSITIONS = 100000
+# Le préchauffage lit la base par lots de cette taille, en rendant le verrou entre deux lots
+LOT_PRECHAUFFAGE = 5000
+# La taille de la base est vérifiée toutes les NB_ECRITURES_TAILLE écritures
+NB_ECRITURES_TAILLE = 1000
+# Les positions servies depuis la mémoire sont marquées comme utilisées dans la base par lots
+# de LOT_UTILISATIONS, ou au plus tard DELAI_UTILISATIONS secondes après la première
+LOT_UTILISATIONS = 100
+DELAI_UTILISATIONS = 30
+
+
+class StockagePositions:
+    """
+    Résultats de recherche gardés sur disque (base SQLite) d'une exécution à l'autre.
+    Une ligne par position et par moteur : hash Zobrist, moteur ("minimax" ou "mcts"), coup UCI,
+    score, qualité (profondeur pour minimax, visites de la racine pour MCTS) et date de dernière
+    utilisation. Au-delà de taille_max lignes, les moins récemment utilisées sont supprimées.
+    """
+    def __init__(self, fichier, taille_max=POSITIONS_MAX):
+        self.taille_max = taille_max
+        self.ecritures = 0
+        self.verrou = threading.Lock()
+        self.connexion = sqlite3.connect(fichier, check_same_thread=False)
+        with self.verrou, self.connexion:
+            self.connexion.execute("CREATE TABLE IF NOT EXISTS positions (cle INTEGER, moteur TEXT, coup TEXT, "
+                                   "score REAL, qualite INTEGER, utilise REAL, PRIMARY KEY (cle, moteur))")
+            self.connexion.execute("CREATE INDEX IF NOT EXISTS positions_utilise ON positions (utilise)")
+
+    @staticmethod
+    def _cle(cle):
+        # SQLite stocke des entiers signés sur 64 bits
+        return cle - (1 << 64) if cle >= (1 << 63) else cle
+
+    def lire(self, cle, moteur):
+        """(coup, score, qualité), ou None ; la ligne est marquée comme utilisée"""
+        with self.verrou, self.connexion:
+            ligne = self.connexion.execute("SELECT coup, score, qualite FROM positions WHERE cle = ? AND moteur = ?",
+                                           (self._cle(cle), moteur)).fetchone()
+            if ligne is not None:
+                self.connexion.execute("UPDATE positions SET utilise = ? WHERE cle = ? AND moteur = ?",
+                                       (time.time(), self._cle(cle), moteur))
+        return ligne
+
+    def toucher(self, cles):
+        """Marque les (cle, moteur) comme utilisés maintenant"""
+        maintenant = time.time()
+        with self.verrou, self.connexion:
+            self.connexion.executemany("UPDATE positions SET utilise = ? WHERE cle = ? AND moteur = ?",
+                                       [(maintenant, self._cle(cle), moteur) for cle, moteur in cles])
+
+    def ecrire(self, cle, moteur, coup, score, qualite):
+        """Un résultat ne remplace que celui d'une recherche de qualité au plus égale"""
+        with self.verrou, self.connexion:
+            self.connexion.execute(
+                "INSERT INTO positions VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (cle, moteur) DO UPDATE SET "
+                "coup = excluded.coup, score = excluded.score, qualite = excluded.qualite, utilise = excluded.utilise "
+                "WHERE excluded.qualite >= positions.qualite",
+                (self._cle(cle), moteur, coup, score, qualite, time.time()))
+            self.ecritures += 1
+            if self.ecritures % NB_ECRITURES_TAILLE == 0:
+                self._limiter()
+
+    def _limiter(self):
+        # Appelé avec le verrou
+        nombre = self.connexion.execute("SELECT COUNT(*) FROM positions").fetchone()[0]
+        if nombre > self.taille_max:
+            self.connexion.execute("DELETE FROM positions WHERE rowid IN "
+                                   "(SELECT rowid FROM positions ORDER BY utilise LIMIT ?)", (nombre - self.taille_max,))
+
+    def lot(self, decalage, taille):
+        """Lignes (cle, moteur, coup, score, qualité) de la plus à la moins récemment utilisée"""
+        with self.verrou:
+            lignes = self.connexion.execute("SELECT cle, moteur, coup, score, qualite FROM positions "
+                                            "ORDER BY utilise DESC LIMIT ? OFFSET ?", (taille, decalage)).fetchall()
+        return [(cle + (1 << 64) if cle < 0 else cle, moteur, coup, score, qualite)
+                for cle, moteur, coup, score, qualite in lignes]
+
+    def fermer(self):
+        with self.verrou:
+            self.connexion.close()
+
+
+class Positions:
+    """
+    Meilleurs coups déjà calculés par le serveur, par hash Zobrist de la position et par moteur.
+    /play les consulte avant de chercher et y écrit le résultat des recherches d'au moins
+    QUALITE_MIN (profondeur pour minimax, visites pour MCTS). Un cache mémoire (LRU) est placé
+    devant la base (CHESS_POSITIONS_DB) ; sans base, rien n'est mémorisé.
+    prechauffer() remplit le cache mémoire en arrière-plan : en attendant, les lectures vont à la base.
+    """
+    def __init__(self, stockage=None, qualite_min=QUALITE_MIN, taille=TAILLE_CACHE_POSITIONS):
+        self.stockage = stockage
+        self.qualite_min = qualite_min
+        self.taille = taille
+        self.resultats = OrderedDict()
+        self.verrou = threading.Lock()
+        self.prechauffage = None
+        # Positions servies depuis la mémoire, pas encore marquées comme utilisées dans la base
+        self.utilisees = set()
+        self.premiere_utilisation = None
+
+    def _memoriser(self, cle, entree):
+        # Appelé avec le verrou
+        self.resultats[cle] = entree
+        self.resultats.move_to_end(cle)
+        while len(self.resultats) > self.taille:
+            self.resultats.popitem(last=False)
+
+    def chercher(self, board, moteur, qualite=0):
+        """Coup mémorisé pour board d'une recherche de qualité au moins qualite, ou None"""
+        stockage = self.stockage
+        if stockage is None:
+            return None
+        cle = (cle_zobrist(board), moteur)
+        a_toucher = None
+        with self.verrou:
+            entree = self.resultats.get(cle)
+            if entree is not None:
+                self.resultats.move_to_end(cle)
+                a_toucher = self._utiliser(cle)
+        if a_toucher:
+            stockage.toucher(a_toucher)
+        if entree is None:
+            entree = stockage.lire(*cle)
+            if entree is None:
+                mesures.incrementer("positions_absentes", moteur=moteur)
+                return None
+            with self.verrou:
+                self._memoriser(cle, entree)
+        coup, _, qualite_memorisee = entree
+        move = chess.Move.from_uci(coup)
+        # Collision de hash : le coup doit être légal dans cette position
+        if qualite_memorisee < qualite or not board.is_legal(move):
+            mesures.incrementer("positions_insuffisantes", moteur=moteur)
+            return None
+        mesures.incrementer("positions_trouvees", moteur=moteur)
+        return move
+
+    def _utiliser(self, cle):
+        # Appelé avec le verrou : renvoie le lot à écrire dans la base quand il est complet ou ancien
+        maintenant = time.monotonic()
+        if not self.utilisees:
+            self.premiere_utilisation = maintenant
+        self.utilisees.add(cle)
+        if len(self.utilisees) < LOT_UTILISATIONS and maintenant - self.premiere_utilisation < DELAI_UTILISATIONS:
+            return None
+        lot, self.utilisees = self.utilisees, set()
+        return lot
+
+    def enregistrer(self, board, moteur, move, score, qualite):
+        """Mémorise le résultat d'une recherche s'il atteint la qualité minimale du moteur"""
+        stockage = self.stockage
+        if stockage is None or move is None or qualite <= 0 or qualite < self.qualite_min.get(moteur, 0):
+            return
+        cle = (cle_zobrist(board), moteur)
+        with self.verrou:
+            entree = self.resultats.get(cle)
+            if entree is None or entree[2] <= qualite:
+                self._memoriser(cle, (move.uci(), score, qualite))
+        stockage.ecrire(cle[0], moteur, move.uci(), score, qualite)
+        mesures.incrementer("positions_enregistrees", moteur=moteur)
+
+    def prechauffer(self):
+        """Charge les positions les plus récemment utilisées dans le cache mémoire, dans un thread"""
+        if self.stockage is None or self.prechauffage is not None:
+            return
+        self.prechauffage = threading.Thread(target=self._prechauffer, name="prechauffage", daemon=True)
+        self.prechauffage.start()
+
+    def _prechauffer(self):
+        debut = time.perf_counter()
+        charges = 0
+        try:
+            while charges < self.taille:
+                stockage = self.stockage
+                if stockage is None:
+                    break
+                lignes = stockage.lot(charges, min(LOT_PRECHAUFFAGE, self.taille - charges))
+                if not lignes:
+                    break
+                with self.verrou:
+                    # Du plus au moins récent : une entrée déjà présente (écrite entre-temps) est gardée
+                    for cle, moteur, coup, score, qualite in lignes:
+                        if (cle, moteur) not in self.resultats:
+                            self.resultats[(cle, moteur)] = (coup, score, qualite)
+                            self.resultats.move_to_end((cle, moteur), last=False)
+                charges += len(lignes)
+        except sqlite3.Error as e:
+            journal.warning("préchauffage des positions interrompu : %s", e)
+        journal.info("%d positions chargées en %.2f s", charges, time.perf_counter() - debut)
+
+    def fermer(self):
+        with self.verrou:
+            stockage, self.stockage = self.stockage, None
+            lot, self.utilisees = self.utilisees, set()
+        if stockage is not None:
+            if lot:
+                stockage.toucher(lot)
+            stockage.fermer()
+
+
+positions = Positions(StockagePositions(POSITIONS_DB) if POSITIONS_DB else None)
+a_la_sortie(positions.fermer)
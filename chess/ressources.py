@@ -0,0 +1,161 @@
+import atexit
+import os
+import threading
+
+
+# Configuration, modifiable par variables d'environnement
+# Chemin de l'exécutable UCI (Stockfish) utilisé par MCTS
+ENGINE_PATH = os.environ.get("CHESS_ENGINE_PATH", "stockfish-windows-2022-x86-64-avx2.exe")
+# Nombre maximal de processus moteur (lancés à la demande) et délai par appel en secondes
+ENGINE_POOL_SIZE = int(os.environ.get("CHESS_ENGINE_POOL_SIZE", "2"))
+ENGINE_TIMEOUT = float(os.environ.get("CHESS_ENGINE_TIMEOUT", "10"))
+# Nombre de processus utilisés par MCTS en mode parallèle
+MCTS_PROCESSUS = int(os.environ.get("CHESS_MCTS_PROCESSUS", str(os.cpu_count() or 1)))
+# Fichier SQLite où garder les analyses du moteur d'une exécution à l'autre (rien par défaut)
+ANALYSES_DB = os.environ.get("CHESS_ANALYSES_DB")
+# Fichier SQLite des meilleurs coups déjà calculés par /play (rien par défaut), nombre maximal de positions
+# et qualité minimale d'un résultat pour être gardé : profondeur pour minimax, visites de la racine pour MCTS
+POSITIONS_DB = os.environ.get("CHESS_POSITIONS_DB")
+POSITIONS_MAX = int(os.environ.get("CHESS_POSITIONS_MAX", "1000000"))
+QUALITE_MIN = {
+    "minimax": int(os.environ.get("CHESS_POSITIONS_PROFONDEUR_MIN", "3")),
+    "mcts": int(os.environ.get("CHESS_POSITIONS_VISITES_MIN", "800")),
+}
+# Nombre de recherches lancées en même temps par le serveur et nombre maximal de recherches en attente
+NB_RECHERCHES = int(os.environ.get("CHESS_NB_RECHERCHES", "2"))
+MAX_EN_ATTENTE = int(os.environ.get("CHESS_MAX_EN_ATTENTE", "8"))
+# Compteurs et histogrammes de /metrics (CHESS_METRIQUES=0 pour les couper)
+METRIQUES = os.environ.get("CHESS_METRIQUES", "1") != "0"
+# Niveau du journal (DEBUG, INFO...) : sans CHESS_LOG, le serveur n'écrit rien
+NIVEAU_LOG = os.environ.get("CHESS_LOG")
+# Répertoires des tables de finales Syzygy (.rtbw/.rtbz), séparés par os.pathsep (aucune par défaut)
+SYZYGY_PATH = os.environ.get("CHESS_SYZYGY")
+
+
+class RessourceIndisponible(Exception):
+    """La ressource n'a pas pu être créée (par exemple pas de moteur installé)"""
+
+
+class Registre:
+    """
+    Ressources partagées (moteur externe, figure matplotlib...) créées au premier usage
+    et une seule fois par processus. Une ressource dont la création a échoué n'est pas
+    retentée à chaque appel : get() relève directement RessourceIndisponible.
+    """
+    def __init__(self):
+        self.fabriques = {}
+        self.ressources = {}
+        self.erreurs = {}
+        self.verrou = threading.RLock()
+
+    def enregistrer(self, nom, fabrique, fermeture=None):
+        self.fabriques[nom] = (fabrique, fermeture)
+
+    def get(self, nom):
+        ressource = self.ressources.get(nom)
+        if ressource is not None:
+            return ressource
+        with self.verrou:
+            if nom in self.ressources:
+                return self.ressources[nom]
+            if nom in self.erreurs:
+                raise RessourceIndisponible(nom) from self.erreurs[nom]
+            fabrique, _ = self.fabriques[nom]
+            try:
+                ressource = fabrique()
+            except Exception as e:
+                self.erreurs[nom] = e
+                raise RessourceIndisponible(nom) from e
+            self.ressources[nom] = ressource
+            return ressource
+
+    def disponible(self, nom):
+        try:
+            self.get(nom)
+            return True
+        except RessourceIndisponible:
+            return False
+
+    def oublier(self, nom):
+        """Permet de retenter la création d'une ressource (après avoir changé la configuration)"""
+        with self.verrou:
+            self.erreurs.pop(nom, None)
+
+    def fermer(self):
+        with self.verrou:
+            for nom, ressource in self.ressources.items():
+                fermeture = self.fabriques[nom][1]
+                if fermeture is not None:
+                    try:
+                        fermeture(ressource)
+                    except Exception:
+                        pass
+            self.ressources.clear()
+            self.erreurs.clear()
+
+
+def a_la_sortie(fonction):
+    """
+    Appelle fonction à la sortie de l'interpréteur, avant l'attente des threads non daemon :
+    python-chess fait tourner chaque moteur dans un tel thread, qui ne s'arrête qu'une fois
+    le moteur fermé (atexit passerait trop tard et la sortie resterait bloquée)
+    """
+    enregistrer = getattr(threading, "_register_atexit", atexit.register)
+    enregistrer(fonction)
+
+
+registre = Registre()
+# Les processus moteur sont arrêtés proprement à la sortie
+a_la_sortie(registre.fermer)
+
+
+def creer_pool_moteurs():
+    from pool_moteurs import PoolMoteurs
+    return PoolMoteurs(ENGINE_PATH, ENGINE_POOL_SIZE, ENGINE_TIMEOUT)
+
+
+def sans_moteur():
+    raise RessourceIndisponible("pas de moteur dans les processus de MCTS")
+
+
+def initialiser_processus():
+    # Chaque processus aurait sinon son propre pool de moteurs, au-delà de CHESS_ENGINE_POOL_SIZE :
+    # tous les coups de l'adversaire y sont développés, comme sans moteur installé
+    registre.enregistrer("engines", sans_moteur)
+
+
+def creer_processus():
+    # "spawn" : on ne duplique pas par fork un processus qui a déjà des threads (moteurs, serveur)
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    return ProcessPoolExecutor(max_workers=MCTS_PROCESSUS, mp_context=multiprocessing.get_context("spawn"),
+                               initializer=initialiser_processus)
+
+
+def creer_tables_finales():
+    # Les fichiers sont ouverts à la demande puis gardés ouverts (mmap) par python-chess
+    import chess.syzygy
+    if not SYZYGY_PATH:
+        raise RessourceIndisponible("CHESS_SYZYGY n'est pas défini")
+    tables = chess.syzygy.Tablebase()
+    for repertoire in SYZYGY_PATH.split(os.pathsep):
+        tables.add_directory(repertoire)
+    if not tables.wdl:
+        tables.close()
+        raise RessourceIndisponible(f"aucune table Syzygy dans {SYZYGY_PATH}")
+    return tables
+
+
+def creer_axes():
+    # matplotlib n'est importé que si on dessine un arbre
+    import matplotlib.pyplot as plt
+    fig, ax = plt.subplots(figsize=(20, 10), dpi = 25)
+    ax.set_xlim(0, 15)
+    ax.set_ylim(0, 20)
+    return ax
+
+
+registre.enregistrer("engines", creer_pool_moteurs, lambda pool: pool.fermer())
+registre.enregistrer("processus", creer_processus, lambda pool: pool.shutdown(cancel_futures=True))
+registre.enregistrer("tables_finales", creer_tables_finales, lambda tables: tables.close())
+registre.enregistrer("axes", creer_axes)
@@ -0,0 +1,107 @@
+import random
+import time
+import chess
+from evaluation import materiel, VALEURS_MCTS
+from finales import finales
+
+
+# Le seuil ne s'applique qu'après ce nombre de demi-coups joués dans la simulation
+PLY_MIN_SEUIL = 2
+
+
+class Rollout:
+    """
+    Politique de simulation de MCTS : joue des coups depuis state, puis renvoie
+    la récompense evaluer(state, player) de la position atteinte.
+    - profondeur : nombre maximal de demi-coups joués (None = jusqu'à la fin de la partie)
+    - seuil : variation du matériel (valeurs de MCTS, pion = 1) depuis `depart` (le matériel à la
+      racine de la recherche, à défaut celui du début de la simulation) à partir de laquelle la
+      partie est considérée comme gagnée : on s'arrête avec une récompense de +1 ou -1.
+      Un avantage déjà acquis à la racine ne compte pas, sinon toutes les simulations d'une
+      position déséquilibrée renverraient la même récompense.
+    Dès que la position est dans les tables de finales (CHESS_SYZYGY), la simulation s'arrête
+    sur leur résultat.
+    Les sous-classes choisissent les coups en redéfinissant choisir().
+    """
+    def __init__(self, profondeur=None, seuil=None):
+        self.profondeur = profondeur
+        self.seuil = seuil
+
+    def choisir(self, state, moves):
+        return random.choice(moves)
+
+    def simuler(self, state, player, evaluer, depart=None):
+        # L'IA joue la couleur opposée à celle du joueur
+        ia_blancs = player != "w"
+        pieces_tables = finales.pieces()
+        if depart is None and self.seuil is not None:
+            depart = materiel(state, VALEURS_MCTS)
+        ply = 0
+        while self.profondeur is None or ply < self.profondeur:
+            if self.seuil is not None and ply >= PLY_MIN_SEUIL:
+                ecart = materiel(state, VALEURS_MCTS) - depart
+                if abs(ecart) >= self.seuil:
+                    return 1 if (ecart > 0) == ia_blancs else -1
+            if chess.popcount(state.occupied) <= pieces_tables:
+                recompense = finales.recompense(state, ia_blancs)
+                if recompense is not None:
+                    return recompense
+            moves = list(state.legal_moves)
+            # Fins de partie sans tout le test de is_game_over : la répétition n'est
+            # possible qu'après quelques coups réversibles
+            if not moves or state.is_insufficient_material() or state.halfmove_clock >= 150 or \
+                    (state.halfmove_clock >= 8 and state.is_fivefold_repetition()):
+                break
+            state.push(self.choisir(state, moves))
+            ply += 1
+        return evaluer(state, player)
+
+
+class RolloutAleatoire(Rollout):
+    """Coups uniformément aléatoires"""
+
+
+class RolloutCaptures(Rollout):
+    """Partie légère qui joue une capture (au hasard parmi les captures) avec la probabilité `biais`"""
+    def __init__(self, profondeur=None, seuil=None, biais=0.8):
+        super().__init__(profondeur, seuil)
+        self.biais = biais
+
+    def choisir(self, state, moves):
+        if random.random() < self.biais:
+            captures = [move for move in moves if state.is_capture(move)]
+            if captures:
+                return random.choice(captures)
+        return random.choice(moves)
+
+
+# Politiques disponibles, par nom
+POLITIQUES = {
+    "aleatoire": RolloutAleatoire(),
+    "coupe": RolloutAleatoire(profondeur=40),
+    "coupe_seuil": RolloutAleatoire(profondeur=40, seuil=5),
+    "captures": RolloutCaptures(profondeur=40, seuil=5),
+}
+
+
+def mesurer(politique, boards, evaluer, player="b", duree=2.0):
+    """Nombre de simulations par seconde de la politique, en tournant sur les positions données"""
+    nb = 0
+    debut = time.perf_counter()
+    while time.perf_counter() - debut < duree:
+        politique.simuler(boards[nb % len(boards)].copy(), player, evaluer)
+        nb += 1
+    return nb / (time.perf_counter() - debut)
+
+
+if __name__ == "__main__":
+    from mcts import evaluate
+    positions = [
+        chess.Board(),
+        chess.Board("r1bqkb1r/pppp1ppp/2n2n2/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4"),
+        chess.Board("r2q2nr/pppk3p/5ppB/2P5/2BN4/2N4P/PPP1QP1P/R3K2R w KQ - 4 14"),
+        chess.Board("8/5pk1/6p1/8/3R4/6P1/5PK1/3r4 w - - 0 40"),
+    ]
+    random.seed(0)
+    for nom, politique in POLITIQUES.items():
+        print(f"{nom:12} {mesurer(politique, positions, evaluate):8.1f} simulations/s")
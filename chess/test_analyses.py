@@ -0,0 +1,91 @@
+"""
+Cache des analyses et expansion de MCTS avec moteur_stub.py (cache, analyse en attente, stockage) :
+    python -m pytest -q test_analyses.py
+"""
+import os
+import sys
+import chess
+import chess.engine
+import pytest
+import mcts
+from analyses import Analyses, StockageAnalyses
+from mcts import Arbre, expand_node
+from pool_moteurs import PoolMoteurs
+from ressources import registre
+
+
+REPERTOIRE = os.path.dirname(os.path.abspath(__file__))
+STUB = os.path.join(REPERTOIRE, "moteur_stub.py")
+LIMITE = chess.engine.Limit(time=0.01, depth=2)
+PROFONDE = chess.engine.Limit(time=0.01, depth=5)
+
+
+def brancher_stub(monkeypatch, *options):
+    pool = PoolMoteurs([sys.executable, STUB, *options], 1, 5)
+    monkeypatch.setitem(registre.ressources, "engines", pool)
+    return pool
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    pool = brancher_stub(monkeypatch)
+    yield pool
+    pool.fermer()
+
+
+def test_cache(stub):
+    analyses = Analyses(limite=LIMITE, nb_threads=1)
+    try:
+        board = chess.Board()
+        lignes = analyses.analyser(board)
+        # Le stub joue le premier coup légal
+        assert lignes[0]["pv"][0] == next(iter(board.legal_moves)).uci()
+        assert analyses.demander(board) == lignes
+        assert analyses.appels == 1
+        # Une limite plus profonde n'est pas servie par l'analyse courte
+        assert analyses.demander(board, limite=PROFONDE) is None
+        analyses.analyser(board, limite=PROFONDE)
+        assert analyses.appels == 2
+    finally:
+        analyses.fermer()
+
+
+def test_expansion_en_attente(monkeypatch):
+    pool = brancher_stub(monkeypatch, "--lent", "0.3")
+    analyses = Analyses(limite=LIMITE, nb_threads=1)
+    monkeypatch.setattr(mcts, "analyses", analyses)
+    monkeypatch.setattr(mcts, "EXPANSION_ASYNCHRONE", True)
+    try:
+        board = chess.Board()
+        arbre = Arbre(board)
+        # Au tour de l'adversaire (player) : le noeud reste une feuille tant que l'analyse tourne
+        assert expand_node(arbre, Arbre.RACINE, board.copy(), "w") == Arbre.RACINE
+        assert arbre.nb_enfants[Arbre.RACINE] == 0
+        analyses.analyser(board)
+        state = board.copy()
+        enfant = expand_node(arbre, Arbre.RACINE, state, "w")
+        assert arbre.nb_enfants[Arbre.RACINE] == 1
+        assert arbre.moves[enfant] == next(iter(board.legal_moves))
+        assert state.move_stack == [arbre.moves[enfant]]
+        assert analyses.appels == 1
+    finally:
+        analyses.fermer()
+        pool.fermer()
+
+
+def test_stockage(stub, tmp_path):
+    fichier = str(tmp_path / "analyses.db")
+    board = chess.Board()
+    analyses = Analyses(limite=LIMITE, nb_threads=1, stockage=StockageAnalyses(fichier))
+    try:
+        lignes = analyses.analyser(board)
+    finally:
+        analyses.fermer()
+    # Une autre exécution relit l'analyse sur disque sans interroger le moteur, pour la même limite seulement
+    analyses = Analyses(limite=LIMITE, nb_threads=1, stockage=StockageAnalyses(fichier))
+    try:
+        assert analyses.demander(board) == lignes
+        assert analyses.appels == 0
+        assert analyses.resultat(board, limite=PROFONDE) is None
+    finally:
+        analyses.fermer()
@@ -0,0 +1,39 @@
+"""
+Positions calmes et critiques pour position_critique (sans moteur) :
+    python -m pytest -q test_mat.py
+"""
+import chess
+import pytest
+from mat import position_critique
+
+
+CALMES = [
+    chess.STARTING_FEN,
+    # 1.e4 e5 2.Nf3 Nc6
+    "r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3",
+    # Partie italienne : Fxf7+ existe mais laisse trois réponses
+    "r1bqk1nr/pppp1ppp/2n5/2b1p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4",
+]
+
+CRITIQUES = [
+    # Echec à parer
+    "rnbqkbnr/ppp2ppp/8/1B1pp3/4P3/8/PPPP1PPP/RNBQK1NR b KQkq - 1 3",
+    # Mat du couloir : Ta8#
+    "6k1/5ppp/8/8/8/8/5PPP/R5K1 w - - 0 1",
+    # Dame prise par un pion
+    "rnb1kbnr/pppp1ppp/8/4p3/3q4/2P5/PP1PPPPP/RNBQKBNR w KQkq - 0 3",
+]
+
+
+@pytest.mark.parametrize("fen", CALMES)
+def test_position_calme(fen):
+    board = chess.Board(fen)
+    assert board.is_valid()
+    assert not position_critique(board)
+
+
+@pytest.mark.parametrize("fen", CRITIQUES)
+def test_position_critique(fen):
+    board = chess.Board(fen)
+    assert board.is_valid()
+    assert position_critique(board)
@@ -0,0 +1,45 @@
+"""
+Recherches MCTS parallèles reproductibles avec une graine (sans moteur, processus réels) :
+    python -m pytest -q test_mcts_parallele.py
+"""
+import chess
+import pytest
+from mcts import Arbre, statistiques_racine
+from mcts_parallele import recherche_racine, mcts_feuilles
+from ressources import registre, sans_moteur
+
+
+# Milieu de partie hors du livre d'ouvertures
+FEN = "r1bqkbnr/ppp1pppp/2n5/3p4/3P1B2/4P3/PPP2PPP/RN1QKBNR w KQkq - 1 4"
+
+
+@pytest.fixture(autouse=True)
+def pas_de_moteur(monkeypatch):
+    # Comme dans les processus : aucun moteur, l'adversaire est développé en entier
+    monkeypatch.setitem(registre.fabriques, "engines", (sans_moteur, None))
+    registre.oublier("engines")
+    yield
+    registre.oublier("engines")
+
+
+def visites(statistiques):
+    return {move: visites for move, (_, visites) in statistiques.items()}
+
+
+def test_graine_racine():
+    board = chess.Board(FEN)
+    premiere = recherche_racine(board, 300, "b", nb_processus=2, graine=7)
+    seconde = recherche_racine(board, 300, "b", nb_processus=2, graine=7)
+    assert sum(visites(premiere).values()) == 600
+    assert visites(premiere) == visites(seconde)
+
+
+def test_graine_feuilles():
+    board = chess.Board(FEN)
+    resultats = []
+    for _ in range(2):
+        arbre = Arbre(board)
+        mcts_feuilles(arbre, board, 200, "b", nb_processus=2, graine=7)
+        resultats.append(visites(statistiques_racine(arbre)))
+    assert sum(resultats[0].values()) == 200
+    assert resultats[0] == resultats[1]
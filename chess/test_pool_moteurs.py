@@ -0,0 +1,57 @@
+"""
+Pannes du pool de moteurs, avec moteur_stub.py (délai dépassé, plantage) :
+    python -m pytest -q test_pool_moteurs.py
+"""
+import os
+import subprocess
+import sys
+import chess
+import chess.engine
+import pytest
+from pool_moteurs import PoolMoteurs, ERREURS_MOTEUR
+
+
+REPERTOIRE = os.path.dirname(os.path.abspath(__file__))
+STUB = os.path.join(REPERTOIRE, "moteur_stub.py")
+LIMITE = chess.engine.Limit(time=0.01)
+
+
+def creer_pool(*options):
+    return PoolMoteurs([sys.executable, STUB, *options], 1, 5)
+
+
+def test_delai_depasse():
+    pool = creer_pool("--lent", "0.2")
+    try:
+        with pytest.raises(TimeoutError):
+            pool.analyse(chess.Board(), LIMITE, timeout=0.05)
+        assert pool.redemarrages == 1
+        # Le moteur tué est remplacé au prochain appel
+        assert pool.analyse(chess.Board(), LIMITE, timeout=5)["score"] is not None
+    finally:
+        pool.fermer()
+
+
+def test_plantage():
+    pool = creer_pool("--plantage", "2")
+    try:
+        pool.analyse(chess.Board(), LIMITE)
+        with pytest.raises(ERREURS_MOTEUR):
+            pool.analyse(chess.Board(), LIMITE)
+        assert pool.redemarrages == 1
+        assert pool.analyse(chess.Board(), LIMITE)["score"] is not None
+    finally:
+        pool.fermer()
+
+
+def test_sortie_apres_delai_depasse():
+    # Un moteur tué sur délai dépassé ne doit pas empêcher l'interpréteur de sortir
+    script = ("import chess, chess.engine, test_pool_moteurs as t\n"
+              "pool = t.creer_pool('--lent', '0.2')\n"
+              "try:\n"
+              "    pool.analyse(chess.Board(), t.LIMITE, timeout=0.05)\n"
+              "except TimeoutError:\n"
+              "    pass\n"
+              "pool.fermer()\n")
+    resultat = subprocess.run([sys.executable, "-c", script], cwd=REPERTOIRE, timeout=30)
+    assert resultat.returncode == 0
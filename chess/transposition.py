@@ -0,0 +1,122 @@
+import threading
+import chess
+import chess.polyglot
+
+
+# Type de score stocké dans une entrée
+EXACT = 0       # score exact (il était compris entre alpha et beta)
+LOWERBOUND = 1  # le vrai score est >= au score stocké (coupure beta)
+UPPERBOUND = 2  # le vrai score est <= au score stocké (aucun coup n'a dépassé alpha)
+
+TAILLE_BUCKET = 4
+
+
+def cle_zobrist(board):
+    """Hash Zobrist 64 bits (polyglot) du plateau : pièces, trait, roques et prise en passant"""
+    return chess.polyglot.zobrist_hash(board)
+
+
+def cle_transposition(board):
+    """
+    Clé de la table de transposition : hash de la position telle que python-chess la compare pour
+    les répétitions, une vingtaine de fois plus rapide que cle_zobrist. Elle peut changer avec la
+    version de python-chess : ce qui est gardé sur disque reste indexé par cle_zobrist
+    """
+    return hash(board._transposition_key())
+
+
+# Board._transposition_key est privée (vérifiée avec python-chess 1.11) : si une autre version
+# ne l'a plus, la table revient au hash Zobrist, plus lent mais public
+if not hasattr(chess.Board, "_transposition_key"):
+    cle_transposition = cle_zobrist
+
+
+def inverser_borne(flag):
+    """Borne correspondante quand on change le signe du score"""
+    if flag == LOWERBOUND:
+        return UPPERBOUND
+    elif flag == UPPERBOUND:
+        return LOWERBOUND
+    return EXACT
+
+
+class TranspositionTable:
+    """
+    Table de transposition de taille fixe indexée par la clé du plateau (cle_transposition).
+    Chaque clé tombe dans un bucket de `taille_bucket` entrées. En cas de conflit on garde
+    les entrées les plus profondes des recherches en cours et on remplace en priorité les
+    entrées laissées par les recherches finies (âge), puis la moins profonde.
+    Chaque recherche a son âge, gardé par thread : plusieurs recherches peuvent partager la table.
+    Une entrée est un tuple (cle, depth, flag, score, move, age).
+    """
+    def __init__(self, taille=1000000, taille_bucket=TAILLE_BUCKET):
+        self.taille_bucket = taille_bucket
+        self.nb_buckets = max(1, taille // taille_bucket)
+        self.entrees = [None] * (self.nb_buckets * taille_bucket)
+        self.verrou = threading.Lock()
+        self.local = threading.local()
+        self.age = 0
+        # Ages des recherches en cours ; les entrées d'âge >= age_min sont protégées
+        self.actives = set()
+        self.age_min = 0
+
+    def nouvelle_recherche(self):
+        """
+        A appeler avant chaque recherche, dans le thread qui la fait : les entrées des recherches
+        finies deviennent remplaçables en priorité. fin_recherche doit suivre
+        """
+        with self.verrou:
+            self.age += 1
+            self.actives.add(self.age)
+            self.age_min = min(self.actives)
+            self.local.age = self.age
+
+    def fin_recherche(self):
+        """Fin de la recherche de ce thread : ses entrées ne sont plus protégées"""
+        with self.verrou:
+            self.actives.discard(getattr(self.local, "age", None))
+            self.age_min = min(self.actives) if self.actives else self.age + 1
+            self.local.age = None
+
+    def clear(self):
+        with self.verrou:
+            self.entrees = [None] * (self.nb_buckets * self.taille_bucket)
+            self.age = 0
+            self.actives.clear()
+            self.age_min = 0
+
+    def lookup(self, cle):
+        debut = (cle % self.nb_buckets) * self.taille_bucket
+        for i in range(debut, debut + self.taille_bucket):
+            entree = self.entrees[i]
+            if entree is not None and entree[0] == cle:
+                return entree
+        return None
+
+    def store(self, cle, score, flag, depth, move=None):
+        # Hors recherche déclarée (nouvelle_recherche), l'âge courant
+        age = getattr(self.local, "age", None) or self.age
+        age_min = min(self.age_min, age)
+        debut = (cle % self.nb_buckets) * self.taille_bucket
+        victime = debut
+        priorite_victime = None
+        for i in range(debut, debut + self.taille_bucket):
+            entree = self.entrees[i]
+            if entree is None:
+                victime = i
+                break
+            if entree[0] == cle:
+                # Même position : on ne remplace pas une analyse plus profonde d'une recherche en cours
+                if entree[5] >= age_min and entree[1] > depth and flag != EXACT:
+                    return
+                # On garde l'indication de meilleur coup si la nouvelle entrée n'en a pas
+                if move is None:
+                    move = entree[4]
+                victime = i
+                break
+            # Les entrées des recherches finies partent en premier, puis les moins profondes
+            priorite = entree[1] + (1000 if entree[5] >= age_min else 0)
+            if priorite_victime is None or priorite < priorite_victime:
+                priorite_victime = priorite
+                victime = i
+        self.entrees[victime] = (cle, depth, flag, score, move, age)
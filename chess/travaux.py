@@ -0,0 +1,149 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from ressources import NB_RECHERCHES, MAX_EN_ATTENTE, a_la_sortie
+from instrumentation import mesures
+
+
+# Durée (en secondes) pendant laquelle le résultat d'un travail terminé reste consultable
+DUREE_CONSERVATION = 600
+
+EN_ATTENTE = "en_attente"
+EN_COURS = "en_cours"
+TERMINE = "termine"
+ANNULE = "annule"
+ERREUR = "erreur"
+
+
+class FileSaturee(Exception):
+    """Trop de recherches en cours ou en attente : la requête doit être refaite plus tard"""
+
+
+class Travail:
+    """
+    Une recherche lancée en arrière-plan. `arret` est transmis à la recherche pour l'interrompre ;
+    `suivi` est l'objet de la recherche en cours (Recherche de minimax ou Arbre de MCTS) qui
+    donne le meilleur coup trouvé jusqu'ici.
+    """
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.etat = EN_ATTENTE
+        self.resultat = None
+        self.erreur = None
+        self.arret = threading.Event()
+        self.suivi = None
+        self.future = None
+        self.cree = time.monotonic()
+        self.debut = None
+        self.fin = None
+
+    def termine(self):
+        return self.etat in (TERMINE, ANNULE, ERREUR)
+
+    def meilleur_coup(self):
+        if self.resultat is not None:
+            return self.resultat
+        suivi = self.suivi
+        if suivi is None:
+            return None
+        coup = suivi.meilleur_coup()
+        return None if coup is None else str(coup)
+
+    def progression(self):
+        """Etat de la recherche, complété par ce qu'en dit son objet de suivi"""
+        progression = {'id': self.id, 'etat': self.etat}
+        if self.debut is not None:
+            progression['duree'] = round((self.fin or time.monotonic()) - self.debut, 3)
+        suivi = self.suivi
+        if suivi is not None:
+            progression.update(suivi.progression())
+        return progression
+
+    def annuler(self):
+        """Une recherche en attente n'est pas lancée, une recherche en cours s'arrête sur son meilleur coup"""
+        self.arret.set()
+        if self.future is not None and self.future.cancel():
+            self.etat = ANNULE
+            self.fin = time.monotonic()
+
+    def description(self):
+        description = {'id': self.id, 'etat': self.etat, 'meilleur_coup': self.meilleur_coup()}
+        if self.etat in (TERMINE, ANNULE) and self.resultat is not None:
+            description['ai_move'] = self.resultat
+        if self.erreur is not None:
+            description['error'] = self.erreur
+        return description
+
+
+class Travaux:
+    """
+    Recherches exécutées par un pool borné de `nb_recherches` threads. Au-delà de
+    `max_en_attente` recherches en attente, soumettre() lève FileSaturee au lieu d'allonger la file.
+    Les travaux terminés sont oubliés après `conservation` secondes.
+    """
+    def __init__(self, nb_recherches=NB_RECHERCHES, max_en_attente=MAX_EN_ATTENTE, conservation=DUREE_CONSERVATION):
+        self.nb_recherches = max(1, nb_recherches)
+        self.max_en_attente = max_en_attente
+        self.conservation = conservation
+        self.travaux = {}
+        self.verrou = threading.Lock()
+        self.executeur = None
+
+    def _oublier_anciens(self):
+        # Appelé avec le verrou
+        limite = time.monotonic() - self.conservation
+        for id in [id for id, travail in self.travaux.items() if travail.fin is not None and travail.fin < limite]:
+            del self.travaux[id]
+
+    def soumettre(self, fonction, *args):
+        """Lance fonction(*args, travail) en arrière-plan et renvoie le Travail"""
+        with self.verrou:
+            self._oublier_anciens()
+            actifs = sum(1 for travail in self.travaux.values() if not travail.termine())
+            if actifs >= self.nb_recherches + self.max_en_attente:
+                mesures.incrementer("recherches_refusees")
+                raise FileSaturee()
+            if self.executeur is None:
+                self.executeur = ThreadPoolExecutor(max_workers=self.nb_recherches, thread_name_prefix="recherche")
+            travail = Travail()
+            self.travaux[travail.id] = travail
+            travail.future = self.executeur.submit(self._executer, travail, fonction, args)
+        return travail
+
+    def _executer(self, travail, fonction, args):
+        travail.debut = time.monotonic()
+        mesures.observer("recherche_attente_secondes", travail.debut - travail.cree)
+        travail.etat = EN_COURS
+        try:
+            travail.resultat = fonction(*args, travail)
+            travail.etat = ANNULE if travail.arret.is_set() else TERMINE
+        except Exception as e:
+            travail.erreur = str(e)
+            travail.etat = ERREUR
+        finally:
+            travail.fin = time.monotonic()
+        return travail.resultat
+
+    def get(self, id):
+        with self.verrou:
+            return self.travaux.get(id)
+
+    def annuler(self, id):
+        travail = self.get(id)
+        if travail is not None:
+            travail.annuler()
+        return travail
+
+    def fermer(self):
+        with self.verrou:
+            executeur, self.executeur = self.executeur, None
+            travaux = list(self.travaux.values())
+        for travail in travaux:
+            travail.annuler()
+        if executeur is not None:
+            executeur.shutdown(wait=False, cancel_futures=True)
+
+
+travaux = Travaux()
+a_la_sortie(travaux.fermer)